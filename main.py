@@ -1,13 +1,10 @@
 import time
 import threading
-from flask import Flask, jsonify
-from flask_socketio import SocketIO
+from flask import Flask, jsonify, request
+from flask_socketio import SocketIO, ConnectionRefusedError, emit, join_room, leave_room
 from flask_cors import CORS
-from modules.water_level_sensor import WaterLevelSensor
-from modules.rain_sensor_module import RainSensor
-from modules.smoke_sensor_module import SmokeSensor
-from modules.camera_module import CameraModule
-import os
+from modules.sensor_scheduler import SensorScheduler
+from modules.sensor_hub import SensorHub, SENSOR_INTERVALS, HEARTBEAT_CHECK_INTERVAL
 
 # Initialize Flask app
 app = Flask(__name__)
@@ -19,56 +16,19 @@ CORS(app, resources={r"/*": {"origins": "*"}})
 # Initialize SocketIO with CORS allowed
 socketio = SocketIO(app, cors_allowed_origins="*", async_mode='threading')
 
-def camera_callback(data):
-    socketio.emit('camera_data', data)
-    # If the processed frame contains detection data
-    if 'detections' in data.get('frame', {}):
-        socketio.emit('camera_alert', {
-            'message': f"Object detected in camera view",
-            'detections': data['frame']['detections']
-        })
-
-# Define sensor callbacks
-def water_level_callback(data):
-    socketio.emit('water_level_reading', data)
-    # Send alert if water level is high
-    if data.get('high_water_level'):
-        socketio.emit('water_level_alert', {
-            'message': f"HIGH WATER LEVEL DETECTED: {data['value']}"
-        })
-
-def rain_sensor_callback(data):
-    socketio.emit('rain_sensor_reading', data)
-    # Send alert if rain is detected
-    if data.get('rain_detected'):
-        socketio.emit('rain_alert', {
-            'message': f"RAINFALL DETECTED: {data['value']}"
-        })
-
-def smoke_sensor_callback(data):
-    socketio.emit('smoke_sensor_reading', data)
-    # Send alert if smoke is detected
-    if data.get('smoke_detected'):
-        socketio.emit('smoke_alert', {
-            'message': f"SMOKE/GAS DETECTED: {data['value']}"
-        })
-
-# Initialize sensors with callbacks
-water_sensor = WaterLevelSensor(callback=water_level_callback)
-rain_sensor = RainSensor()
-smoke_sensor = SmokeSensor()
-# Get ML server URL from environment variable or use default
-ml_server_url = os.environ.get('ML_SERVER_URL', 'http://localhost:5001')
-
-camera = CameraModule(
-    ml_server_url=ml_server_url,            # Using environment variable with fallback
-    capture_interval=0.5,                   # Adjust based on your needs
-    resolution=(640, 480)                   # Adjust based on your needs
-)
-
-
-# Dictionary to store sensor threads
-sensor_threads = {}
+# Sensors, callbacks and client fan-out, shared with main_async.py (see modules.sensor_hub)
+hub = SensorHub()
+hub.attach(socketio.server)
+
+# Single scheduler driving every sensor read, instead of one thread per sensor
+sensor_scheduler = SensorScheduler()
+
+def _response(body, status=200, headers=None):
+    """Flask response for a (body, status[, headers]) result of the hub."""
+    response = app.response_class() if body is None else jsonify(body)
+    response.status_code = status
+    response.headers.update(headers or {})
+    return response
 
 # API routes
 @app.route('/')
@@ -77,80 +37,143 @@ def index():
 
 @app.route('/api/status')
 def status():
-    return jsonify({
-        "status": "online",
-        "sensors": {
-            "water_level": water_sensor.is_running,
-            "rain": rain_sensor.is_running,
-            "smoke": smoke_sensor.is_running,
-            "camera": camera.is_running
-        }
-    })
-
-# Start sensor monitoring in separate threads
+    body, code = hub.status()
+    body["scheduler"] = sensor_scheduler.get_stats()
+    return _response(body, code)
+
+@app.route('/api/snapshot')
+def snapshot():
+    return _response(*hub.snapshot(request.args, request.headers.get('If-None-Match')))
+
+@app.route('/api/metrics/latency')
+def latency_metrics():
+    return _response(*hub.latency_metrics())
+
+@app.route('/api/sensors/<name>/history')
+def sensor_history(name):
+    return _response(*hub.sensor_history(name, request.args))
+
+@app.route('/api/sensors/<name>/recent')
+def sensor_recent(name):
+    return _response(*hub.sensor_recent(name, request.args))
+
+def _send_packets(sid, event, packets):
+    """Write an event's pre-encoded packets to one client's Engine.IO socket."""
+    eio_sid = hub.eio_sid(sid)
+    if eio_sid is None:
+        return
+    for pkt in packets:
+        socketio.server.eio.send_packet(eio_sid, pkt)
+
+# Start sensor monitoring on the shared scheduler
 def start_sensors():
     """
-    Initialize and start monitoring threads for all sensors in the system.
-    This function creates separate daemon threads for each sensor (water level, rain, and smoke),
-    and registers them in the global sensor_threads dictionary for tracking. Sensor readings and alerts
-    are emitted to the connected clients via Socket.IO:
+    Start monitoring all sensors in the system on the shared sensor scheduler.
+    Water level polling and rain/smoke polling (only when GPIO edge detection is
+    unavailable) run as tasks on a single worker thread, each at its own rate from
+    SENSOR_INTERVALS. Rain and smoke readings are otherwise pushed by GPIO interrupts.
+    The camera blocks on frame reads, so its capture/encode/send stages keep their own
+    threads. Connecting to the Arduino and the ML server happens in background threads,
+    so the server starts right away.
+    Sensor readings and alerts are emitted to the connected clients via Socket.IO, each
+    event only to the clients subscribed to its stream (camera, water_level, rain, smoke,
+    alerts; see modules.subscriptions). Clients subscribe on connect or with the
+    subscribe/unsubscribe events, and get every stream by default. Clients that connect
+    with batch=true get their water level, rain and smoke events (not alerts) wrapped in
+    one sensor_batch message every SENSOR_BATCH_WINDOW seconds:
+    - sensor_batch: {timestamp: float, readings: [{event: str, data: dict}, ...]}
+    Right after connection_status, every client gets the latest value of each of its streams:
+    - snapshot: {etag: str, timestamp: float, events: {event name: latest payload}}
     @Events Emitted:
-    - water_level_reading: Regular water level sensor readings {value: int}
-    - water_level_alert: Water level alerts {message: str}
-    - rain_sensor_reading: Regular rain sensor readings {value: int, rain_detected: bool}
+    - water_level_reading: Water level sensor readings, sent as new samples arrive {value: int, sample_count: int}
+    - water_level_alert: Water level alerts {message: str}, also sent when the forecast starts warning
+    - water_level_forecast: Rate-of-rise forecast, at most every 5s {level: float, rate: float (per minute),
+      time_to_threshold: float|None (seconds), eta: float|None, warning: bool}
+    - rain_sensor_reading: Rain sensor readings, sent on every state change {value: int, rain_detected: bool}
     - rain_alert: Rain detection alerts {message: str}
-    - smoke_sensor_reading: Regular smoke sensor readings {value: int, smoke_detected: bool}
+    - smoke_sensor_reading: Smoke sensor readings, sent on every state change {value: int, smoke_detected: bool}
+      (rain/smoke: a pulse too short to be read is sent as both transitions, the first with pulse: true)
     - smoke_alert: Smoke detection alerts {message: str}
-    Each sensor runs in its own thread to prevent blocking the main application thread.
-    All threads are set as daemon threads so they will terminate when the main program exits.
+    Readings only go out when hub.emission_policies allows it (change, deadband, heartbeat);
+    emitted readings carry seq/suppressed/suppressed_samples so clients can rebuild the timeline.
+    Rain and smoke are re-read for their heartbeat while their state holds.
+    Per-task read times are reported under "scheduler" in /api/status.
+    Every reading (emitted or not) is also written to the local time-series store.
     """
-    # Water level sensor
-    water_thread = threading.Thread(target=water_sensor.start_monitoring)
-    water_thread.daemon = True
-    water_thread.start()
-    sensor_threads['water_level'] = water_thread
-    
-    # Rain sensor
-    rain_thread = threading.Thread(target=lambda: rain_sensor.start_monitoring(rain_sensor_callback))
-    rain_thread.daemon = True
-    rain_thread.start()
-    sensor_threads['rain'] = rain_thread
-    
-    # Smoke sensor
-    smoke_thread = threading.Thread(target=lambda: smoke_sensor.start_monitoring(smoke_sensor_callback))
-    smoke_thread.daemon = True
-    smoke_thread.start()
-    sensor_threads['smoke'] = smoke_thread
-
-    camera_thread = threading.Thread(target=lambda: camera.start_monitoring(camera_callback))
-    camera_thread.daemon = True
-    camera_thread.start()
-    sensor_threads['camera'] = camera_thread
+    hub.timeseries_store.start()
+    sensor_scheduler.start()
+    hub.client_queues.start(_send_packets, hub.transport_depth)
+    if hub.batch_window > 0:
+        hub.sensor_batcher.start(hub.send_batch)
+
+    hub.rain_sensor.start_monitoring(hub.rain_sensor_callback, interval=SENSOR_INTERVALS['rain'],
+                                     scheduler=sensor_scheduler)
+    hub.smoke_sensor.start_monitoring(hub.smoke_sensor_callback, interval=SENSOR_INTERVALS['smoke'],
+                                      scheduler=sensor_scheduler)
+    # Edge-triggered sensors stay silent while their state holds; re-read them for heartbeats
+    sensor_scheduler.add('heartbeats', hub.send_heartbeats, HEARTBEAT_CHECK_INTERVAL)
+    # Both wait on hardware or the network before they return
+    threading.Thread(target=lambda: hub.water_sensor.start_monitoring(
+        scheduler=sensor_scheduler, poll_interval=SENSOR_INTERVALS['water_level']), daemon=True).start()
+    threading.Thread(target=lambda: hub.camera.start_monitoring(hub.camera_callback), daemon=True).start()
+
+def _apply_rooms(leave, join):
+    for room in leave:
+        leave_room(room)
+    for room in join:
+        join_room(room)
 
 # SocketIO events
 @socketio.on('connect')
-def handle_connect():
-    print('Client connected')
-    socketio.emit('connection_status', {'status': 'connected'})
+def handle_connect(auth=None):
+    """
+    Join the client to its stream rooms: auth={'streams': [...]} or ?streams=a,b on
+    the connection URL, every stream if neither is given. batch=true (in auth or the
+    query) switches the client to sensor_batch messages, format=msgpack to MessagePack
+    payloads (sent as one binary attachment per event). connection_status is always JSON.
+    """
+    try:
+        connection_status, join = hub.connect_client(request.sid, auth, request.args)
+    except ValueError as e:
+        raise ConnectionRefusedError(str(e))
+    _apply_rooms((), join)
+    emit('connection_status', connection_status)
+    # Queued after joining the rooms, so nothing queued behind it is older
+    hub.queue_snapshot(request.sid, connection_status['streams'])
+
+@socketio.on('subscribe')
+def handle_subscribe(data=None):
+    """Join stream rooms; data is a stream list, comma-separated string or {'streams': [...]}."""
+    try:
+        _apply_rooms(*hub.subscribe(request.sid, data))
+    except ValueError as e:
+        return hub.subscription_ack(request.sid, e)
+    return hub.subscription_ack(request.sid)
+
+@socketio.on('unsubscribe')
+def handle_unsubscribe(data=None):
+    """Leave stream rooms; same data format as subscribe."""
+    try:
+        _apply_rooms(*hub.unsubscribe(request.sid, data))
+    except ValueError as e:
+        return hub.subscription_ack(request.sid, e)
+    return hub.subscription_ack(request.sid)
 
 @socketio.on('disconnect')
 def handle_disconnect():
-    print('Client disconnected')
+    hub.disconnect_client(request.sid)
 
 # Cleanup function
 def cleanup():
-    water_sensor.stop_monitoring()
-    rain_sensor.stop_monitoring()
-    smoke_sensor.stop_monitoring()
-    camera.stop_monitoring()
-    
+    hub.stop_sensors()
+    sensor_scheduler.stop()
+    hub.sensor_batcher.stop()
+    hub.client_queues.stop()
+
     # Wait for threads to finish
     time.sleep(1)
-    
-    water_sensor.cleanup()
-    rain_sensor.cleanup()
-    smoke_sensor.cleanup()
-    camera.cleanup()
+
+    hub.cleanup()
 
 
 if __name__ == "__main__":
@@ -163,4 +186,4 @@ if __name__ == "__main__":
     except KeyboardInterrupt:
         print("Shutting down...")
     finally:
-        cleanup()
\ No newline at end of file
+        cleanup()
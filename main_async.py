@@ -0,0 +1,178 @@
+"""
+Asyncio runtime for the sensor system.
+
+Same HTTP routes and Socket.IO events as main.py, but served by an async Socket.IO
+server on aiohttp, with every sensor running as a task on one event loop. Serial
+reads, camera reads and the camera's encode/send stages are offloaded to executor
+threads. Sensors, callbacks and client fan-out are shared with main.py (see
+modules.sensor_hub); this file only holds the aiohttp and AsyncServer glue. Run it
+instead of main.py:
+
+    python main_async.py
+"""
+import asyncio
+import socketio
+from socketio.exceptions import ConnectionRefusedError
+from urllib.parse import parse_qs
+from aiohttp import web
+from modules.sensor_hub import SensorHub, SENSOR_INTERVALS, HEARTBEAT_CHECK_INTERVAL
+
+# Initialize the async Socket.IO server with CORS allowed
+sio = socketio.AsyncServer(async_mode='aiohttp', cors_allowed_origins="*")
+app = web.Application()
+sio.attach(app)
+
+# Sensors, callbacks and client fan-out, shared with main.py
+hub = SensorHub()
+hub.attach(sio)
+
+# Running sensor tasks
+sensor_tasks = {}
+background_tasks = {}
+
+async def send_batches():
+    """Queue the pending sensor_batch messages every batch window."""
+    while True:
+        await asyncio.sleep(hub.batch_window)
+        for room, fmt, payload in hub.sensor_batcher.take_batches():
+            hub.send_batch(room, fmt, payload)
+
+async def send_heartbeats():
+    """Re-read edge-triggered sensors whose heartbeat is due."""
+    loop = asyncio.get_running_loop()
+    while True:
+        await asyncio.sleep(HEARTBEAT_CHECK_INTERVAL)
+        # Off the loop: a re-read waits for any reading being delivered to the loop
+        await loop.run_in_executor(None, hub.send_heartbeats)
+
+async def dispatch_client_queues():
+    """Hand queued events to each client's transport while it keeps up."""
+    wake = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    hub.client_queues.on_put = lambda: loop.call_soon_threadsafe(wake.set)
+    while True:
+        wake.clear()
+        ready = hub.client_queues.take_ready(hub.transport_depth)
+        for sid, event, packets in ready:
+            # Encoded once in hub.broadcast; only written to each client's socket here
+            eio_sid = hub.eio_sid(sid)
+            if eio_sid is None:
+                continue
+            for pkt in packets:
+                await sio.eio.send_packet(eio_sid, pkt)
+        if ready:
+            continue
+        if hub.client_queues.has_pending():
+            # Only busy clients have events left; check their transports again shortly
+            await asyncio.sleep(0.02)
+        else:
+            await wake.wait()
+
+def _response(body, status=200, headers=None):
+    """aiohttp response for a (body, status[, headers]) result of the hub."""
+    if body is None:
+        return web.Response(status=status, headers=headers)
+    return web.json_response(body, status=status, headers=headers)
+
+# API routes
+async def index(request):
+    return web.json_response({"status": "Smart Home System API running"})
+
+async def status(request):
+    return _response(*hub.status())
+
+async def snapshot(request):
+    return _response(*hub.snapshot(request.query, request.headers.get('If-None-Match')))
+
+async def latency_metrics(request):
+    return _response(*hub.latency_metrics())
+
+async def sensor_history(request):
+    # SQLite read + NumPy aggregation off the event loop
+    return _response(*await asyncio.get_running_loop().run_in_executor(
+        None, hub.sensor_history, request.match_info['name'], request.query))
+
+async def sensor_recent(request):
+    return _response(*hub.sensor_recent(request.match_info['name'], request.query))
+
+app.router.add_get('/', index)
+app.router.add_get('/api/status', status)
+app.router.add_get('/api/snapshot', snapshot)
+app.router.add_get('/api/metrics/latency', latency_metrics)
+app.router.add_get('/api/sensors/{name}/history', sensor_history)
+app.router.add_get('/api/sensors/{name}/recent', sensor_recent)
+
+async def _apply_rooms(sid, leave, join):
+    for room in leave:
+        await sio.leave_room(sid, room)
+    for room in join:
+        await sio.enter_room(sid, room)
+
+# SocketIO events
+@sio.event
+async def connect(sid, environ, auth=None):
+    query = {key: values[0] for key, values in parse_qs(environ.get('QUERY_STRING', '')).items()}
+    try:
+        connection_status, join = hub.connect_client(sid, auth, query)
+    except ValueError as e:
+        raise ConnectionRefusedError(str(e))
+    await _apply_rooms(sid, (), join)
+    await sio.emit('connection_status', connection_status, to=sid)
+    # Queued after joining the rooms, so nothing queued behind it is older
+    hub.queue_snapshot(sid, connection_status['streams'])
+
+@sio.event
+async def subscribe(sid, data=None):
+    try:
+        await _apply_rooms(sid, *hub.subscribe(sid, data))
+    except ValueError as e:
+        return hub.subscription_ack(sid, e)
+    return hub.subscription_ack(sid)
+
+@sio.event
+async def unsubscribe(sid, data=None):
+    try:
+        await _apply_rooms(sid, *hub.unsubscribe(sid, data))
+    except ValueError as e:
+        return hub.subscription_ack(sid, e)
+    return hub.subscription_ack(sid)
+
+@sio.event
+async def disconnect(sid):
+    hub.disconnect_client(sid)
+
+async def start_sensors(app):
+    """
+    Start every sensor as a task on the event loop.
+    Emits the same Socket.IO events as main.start_sensors.
+    """
+    hub.timeseries_store.start()
+    background_tasks['client_queues'] = asyncio.create_task(dispatch_client_queues())
+    if hub.batch_window > 0:
+        background_tasks['batcher'] = asyncio.create_task(send_batches())
+    background_tasks['heartbeats'] = asyncio.create_task(send_heartbeats())
+    sensor_tasks['water_level'] = asyncio.create_task(hub.water_sensor.start_monitoring_async())
+    sensor_tasks['rain'] = asyncio.create_task(
+        hub.rain_sensor.start_monitoring_async(hub.rain_sensor_callback, interval=SENSOR_INTERVALS['rain']))
+    sensor_tasks['smoke'] = asyncio.create_task(
+        hub.smoke_sensor.start_monitoring_async(hub.smoke_sensor_callback, interval=SENSOR_INTERVALS['smoke']))
+    sensor_tasks['camera'] = asyncio.create_task(hub.camera.start_monitoring_async(hub.camera_callback))
+
+# Cleanup function
+async def cleanup(app):
+    hub.stop_sensors()
+    for task in background_tasks.values():
+        task.cancel()
+
+    # Wait for the sensor tasks to finish
+    if sensor_tasks:
+        await asyncio.wait(sensor_tasks.values(), timeout=5)
+
+    hub.cleanup()
+
+app.on_startup.append(start_sensors)
+app.on_cleanup.append(cleanup)
+
+
+if __name__ == "__main__":
+    web.run_app(app, host='0.0.0.0', port=5000)
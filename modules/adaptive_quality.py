@@ -0,0 +1,130 @@
+import logging
+import time
+from typing import Optional
+
+
+class AdaptiveQualityController:
+    """
+    Steps JPEG quality and frame downscaling to hold an end-to-end latency target.
+
+    The controller tracks smoothed (EWMA) encode time, payload size and ML server
+    round-trip time. When encode time plus round-trip time exceeds the target it
+    moves one level down the ladder: JPEG quality first, then resolution, so image
+    fidelity degrades before the pipeline has to start dropping frames. When latency
+    falls well below the target it climbs back up in the reverse order, but only if
+    the round trip, scaled by how much larger the better level's payloads were when
+    it was last used, would still fit the target. That keeps it from bouncing
+    between two levels when the link is the bottleneck.
+    """
+
+    QUALITY_LEVELS = (90, 80, 70, 60, 50, 40)
+    SCALE_LEVELS = (1.0, 0.75, 0.5)
+
+    def __init__(self,
+                 latency_target: float = 0.5,
+                 headroom: float = 0.6,
+                 cooldown: float = 2.0,
+                 smoothing: float = 0.3):
+        """
+        Initialize the controller.
+
+        Args:
+            latency_target: Encode + round-trip latency to hold, in seconds (default: 0.5)
+            headroom: Step back up only once latency is below latency_target * headroom
+            cooldown: Minimum seconds between two level changes
+            smoothing: EWMA weight of each new measurement (0-1)
+        """
+        self.latency_target = latency_target
+        self.headroom = headroom
+        self.cooldown = cooldown
+        self.smoothing = smoothing
+
+        # Ladder from best to cheapest: lower quality at full size, then smaller frames
+        self.levels = [(quality, 1.0) for quality in self.QUALITY_LEVELS]
+        self.levels += [(self.QUALITY_LEVELS[-1], scale) for scale in self.SCALE_LEVELS[1:]]
+        self.level = 0
+
+        self.encode_time = None
+        self.payload_size = None
+        self.round_trip_time = None
+        # Smoothed payload size per ladder level, as last measured at that level
+        self._level_sizes = {}
+        self._last_change = time.monotonic()
+
+    @property
+    def quality(self) -> int:
+        """JPEG quality (0-100) to encode the next frame with."""
+        return self.levels[self.level][0]
+
+    @property
+    def scale(self) -> float:
+        """Downscale factor (0-1] to apply to the next frame before encoding."""
+        return self.levels[self.level][1]
+
+    @property
+    def latency(self) -> Optional[float]:
+        """Smoothed encode + round-trip latency, or None until a round trip was measured."""
+        if self.round_trip_time is None:
+            return None
+        return (self.encode_time or 0.0) + self.round_trip_time
+
+    def _smooth(self, current, sample):
+        return sample if current is None else current + self.smoothing * (sample - current)
+
+    def record_encode(self, seconds: float, payload_size: int):
+        """Record how long a frame took to encode and how many bytes it produced."""
+        self.encode_time = self._smooth(self.encode_time, seconds)
+        self.payload_size = self._smooth(self._level_sizes.get(self.level), payload_size)
+        self._level_sizes[self.level] = self.payload_size
+
+    def record_round_trip(self, seconds: float, now: Optional[float] = None):
+        """
+        Record the time from sending a frame to receiving its processed_frame reply.
+
+        Frames that never got a reply are recorded with their age when they were
+        given up on, so losing frames counts as high latency rather than none.
+        """
+        self.round_trip_time = self._smooth(self.round_trip_time, seconds)
+        self._adjust(time.monotonic() if now is None else now)
+
+    def _adjust(self, now: float):
+        """Move one level along the ladder if latency is outside the target band."""
+        if now - self._last_change < self.cooldown:
+            return
+
+        latency = self.latency
+        if latency > self.latency_target and self.level < len(self.levels) - 1:
+            self.level += 1
+        elif (latency < self.latency_target * self.headroom and self.level > 0
+              and self._projected_latency(self.level - 1) <= self.latency_target):
+            self.level -= 1
+        else:
+            return
+
+        self._last_change = now
+        logging.info(f"Camera latency {latency * 1000:.0f} ms (target {self.latency_target * 1000:.0f} ms), "
+                     f"now encoding at quality {self.quality}, scale {self.scale}")
+
+    def _projected_latency(self, level: int) -> float:
+        """Latency expected at another level, assuming the round trip scales with payload size."""
+        current, other = self._level_sizes.get(self.level), self._level_sizes.get(level)
+        if not current or not other:
+            return self.latency
+        return (self.encode_time or 0.0) + self.round_trip_time * other / current
+
+    def get_stats(self):
+        """
+        Get the current level and smoothed measurements.
+
+        Returns:
+            dict: quality, scale, latency_target and smoothed encode_time,
+                  payload_size and round_trip_time
+        """
+        return {
+            'quality': self.quality,
+            'scale': self.scale,
+            'latency_target': self.latency_target,
+            'encode_time': self.encode_time,
+            'payload_size': self.payload_size,
+            'round_trip_time': self.round_trip_time
+        }
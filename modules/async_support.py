@@ -0,0 +1,47 @@
+import asyncio
+import inspect
+import logging
+from typing import Callable
+
+
+async def invoke_callback(callback: Callable, data):
+    """Call a sensor callback that may be a plain function or a coroutine function."""
+    result = callback(data)
+    if inspect.isawaitable(result):
+        await result
+
+
+def threadsafe_callback(callback: Callable, loop: asyncio.AbstractEventLoop, timeout: float = 5.0):
+    """
+    Wrap a (possibly async) callback so it can be called from any thread.
+
+    Calls from other threads (GPIO interrupts, the ML server Socket.IO client) run the
+    callback on the event loop and wait for it to finish, so the caller sees the
+    same completion semantics as a synchronous callback. Calls made on the loop
+    thread itself are scheduled as a task instead of waited on, which would deadlock.
+
+    Args:
+        callback: Function or coroutine function taking the sensor data
+        loop: Event loop the callback must run on
+        timeout: Seconds to wait for the callback to complete
+
+    Returns:
+        Callable: Synchronous wrapper taking the sensor data
+    """
+    def wrapper(data):
+        try:
+            running_loop = asyncio.get_running_loop()
+        except RuntimeError:
+            running_loop = None
+
+        if running_loop is loop:
+            loop.create_task(invoke_callback(callback, data))
+            return
+
+        future = asyncio.run_coroutine_threadsafe(invoke_callback(callback, data), loop)
+        try:
+            future.result(timeout)
+        except Exception as e:
+            logging.error(f"Error in sensor callback: {e}")
+
+    return wrapper
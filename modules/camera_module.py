@@ -1,11 +1,19 @@
+import asyncio
 import threading
 import time
-import cv2
 import base64
 import socketio
 import logging
 import os
+from collections import OrderedDict
 from typing import Callable, Optional
+from modules.frame_pipeline import FrameScheduler, LatestFrameSlot
+from modules.motion_gate import MotionGate
+from modules.adaptive_quality import AdaptiveQualityController
+from modules.jpeg_encoder import FrameEncoder, create_encoder
+from modules.frame_sources import FrameSource, create_frame_source
+from modules.latency_tracer import LatencyTracer
+from modules.async_support import threadsafe_callback
 
 # Set up basic logging configuration if not already configured
 logging.basicConfig(level=logging.INFO)
@@ -14,18 +22,30 @@ class CameraModule:
     """
     Camera module for capturing video frames and sending them to an ML server for processing.
     
-    This module captures frames from a camera (using OpenCV), converts them to base64,
-    and sends them to a Socket.IO server for inference.
+    This module captures frames from a camera (using OpenCV), encodes them as JPEG,
+    and sends them to a Socket.IO server for inference. Frames are sent either as raw
+    JPEG bytes (binary attachment) or as base64 data URIs for older ML servers.
     """
+
+    TRANSPORT_BINARY = 'binary'
+    TRANSPORT_DATA_URI = 'data_uri'
     
     def __init__(self, 
                  ml_server_url: str = None,
                  camera_index: int = 0, 
                  capture_interval: float = 1.0,
                  resolution: tuple = (640, 480),  # Lower resolution for better performance
-                 fps: int = 12,  # Added fps parameter
+                 fps: int = 12,
                  callback: Optional[Callable] = None,
-                 max_reconnect_attempts: int = 5):
+                 max_reconnect_attempts: int = 5,
+                 transport: Optional[str] = None,
+                 max_in_flight: Optional[int] = 1,
+                 in_flight_timeout: float = 5.0,
+                 motion_threshold: Optional[float] = None,
+                 keepalive_interval: float = 5.0,
+                 latency_target: Optional[float] = None,
+                 encoder=None,
+                 source=None):
         """
         Initialize the camera module.
         
@@ -34,27 +54,99 @@ class CameraModule:
             camera_index: Index of the camera to use (default: 0 for first camera)
             capture_interval: Interval between frame captures in seconds
             resolution: Resolution to capture frames at (width, height)
-            fps: Maximum frames per second (default: 12)
+            fps: Maximum frames per second (default: 12). Frames are captured at
+                 the lower of fps and 1 / capture_interval, paced on monotonic
+                 deadlines so encode and send time don't slow the rate down
             callback: Optional callback function to receive frame data
             max_reconnect_attempts: Maximum number of reconnection attempts
+            transport: How frames are sent to the ML server: 'binary' emits the raw JPEG
+                       bytes with a metadata dict, 'data_uri' emits a base64 data URI string
+                       (default: ML_FRAME_TRANSPORT environment variable, or 'binary')
+            max_in_flight: Maximum number of frames sent to the ML server without a
+                           processed_frame reply yet (default: 1, None for no limit).
+                           While the window is full the newest frame waits and replaces
+                           any older pending frame.
+            in_flight_timeout: Seconds after which an unanswered frame is assumed lost
+                               and released from the in-flight window (default: 5.0)
+            motion_threshold: Fraction of changed pixels (0-1) a frame needs before it is
+                              encoded and sent; None sends every frame (default: None)
+            keepalive_interval: With motion gating, maximum seconds between frames sent
+                                on a static scene (default: 5.0)
+            latency_target: Encode + ML round-trip latency in seconds to hold by adapting
+                            JPEG quality and resolution; None encodes every frame at
+                            full size and default quality (default: None)
+            encoder: FrameEncoder instance or backend name ('opencv', 'turbojpeg',
+                     'passthrough', 'auto'); see modules.jpeg_encoder.create_encoder
+                     (default: CAMERA_ENCODER environment variable, or 'auto')
+            source: FrameSource instance or spec string ('video:<path>', 'images:<dir>',
+                    'noise', with optional '?fps=<n>&realtime=0'); see
+                    modules.frame_sources.create_frame_source
+                    (default: CAMERA_SOURCE environment variable, or the camera at
+                    camera_index)
         """
         # Get ML server URL from parameter, environment, or default
         self.ml_server_url = ml_server_url or os.environ.get('ML_SERVER_URL') or 'http://localhost:5001'
         logging.info(f"ML Server URL: {self.ml_server_url}")
         
         self.camera_index = camera_index
+        if isinstance(source, FrameSource):
+            self.source = source
+        else:
+            if source is None:
+                source = os.environ.get('CAMERA_SOURCE', camera_index)
+            self.source = create_frame_source(source, resolution=resolution)
+        logging.info(f"Camera frame source: {self.source}")
         self.capture_interval = capture_interval
         self.resolution = resolution
         self.fps = fps
+        self.target_fps = self._target_fps(fps, capture_interval)
         self.callback = callback
         self.max_reconnect_attempts = max_reconnect_attempts
+
+        self.transport = transport or os.environ.get('ML_FRAME_TRANSPORT') or self.TRANSPORT_BINARY
+        if self.transport not in (self.TRANSPORT_BINARY, self.TRANSPORT_DATA_URI):
+            raise ValueError(f"Unknown frame transport: {self.transport}")
+        logging.info(f"ML frame transport: {self.transport}")
+
+        self.max_in_flight = max_in_flight
+        self.in_flight_timeout = in_flight_timeout
+
+        # Optional change gate that skips encoding frames of a static scene
+        self.motion_gate = None
+        if motion_threshold is not None:
+            self.motion_gate = MotionGate(threshold=motion_threshold, keepalive_interval=keepalive_interval)
+
+        if isinstance(encoder, FrameEncoder):
+            self.encoder = encoder
+        else:
+            self.encoder = create_encoder(encoder)
+
+        # Optional controller that trades image fidelity for latency under load
+        self.quality_controller = None
+        if latency_target is not None:
+            self.quality_controller = AdaptiveQualityController(latency_target=latency_target)
         
         # Initialize state variables
         self.is_running = False
-        self.cap = None
         self._lock = threading.Lock()
         self._stop_event = threading.Event()
         self.ml_server_connected = False
+        self._frame_id = 0
+
+        # Capture -> encode -> send pipeline, linked by latest-wins slots
+        self._raw_frames = LatestFrameSlot('capture')
+        self._encoded_frames = LatestFrameSlot('encode')
+        self._stage_frames = {'capture': 0, 'encode': 0, 'send': 0}
+        self._stage_dropped = {'encode': 0, 'send': 0}
+        self._scheduler = FrameScheduler(self.target_fps)
+
+        # Frames sent to the ML server and not answered yet: frame_id -> trace
+        self._in_flight = OrderedDict()
+        self._in_flight_expired = 0
+        self._window = threading.Condition()
+
+        # Per-stage latency histograms fed by each frame's trace
+        self.tracer = LatencyTracer()
         
         # Initialize Socket.IO client for ML server connection
         self.sio = socketio.Client(reconnection=True, reconnection_attempts=max_reconnect_attempts)
@@ -77,24 +169,46 @@ class CameraModule:
         def disconnect():
             logging.info("Disconnected from ML server")
             self.ml_server_connected = False
+            # Replies for frames in flight will never arrive
+            with self._window:
+                self._in_flight.clear()
+                self._window.notify_all()
         
         @self.sio.event
         def processed_frame(data):
             """Receive processed frame with detections from ML server"""
             print(f"Received processed frame: {type(data)}")
+            frame_id = data.get('frame_id') if isinstance(data, dict) else None
             if isinstance(data, dict):
                 print(f"Keys in processed frame: {data.keys()}")
+
+            trace = self._complete_in_flight(frame_id)
+            if isinstance(data, dict):
+                # Trace stamps are monotonic times of this process, meaningless to
+                # clients; our own copy stays here and feeds the tracer
+                data.pop('trace', None)
+                if trace is not None:
+                    data['frame_id'] = trace['frame_id']
             
             if self.callback:
                 # Forward EXACTLY what we get from the ML server
                 # This ensures the 'image' field with the processed frame gets through
                 self.callback(data)
 
+            if trace is not None:
+                # The callback only queues the frame; each client's dispatcher sends it later
+                trace['queued'] = time.monotonic()
+                inference_time = data.get('inference_time') if isinstance(data, dict) else None
+                self.tracer.record_trace(trace, inference_time)
+
 
     def start_monitoring(self, callback: Optional[Callable] = None):
         """
         Start capturing frames from the camera and sending them to the ML server.
         
+        Opening the camera and connecting to the ML server can take several seconds,
+        so call this from a background thread.
+        
         Args:
             callback: Optional callback function to receive frame data
                       (can be set here or in constructor)
@@ -102,70 +216,128 @@ class CameraModule:
         if callback:
             self.callback = callback
         
+        if not self._open_pipeline():
+            return
+        
+        # Capture, encode and send stages each run in their own thread so a slow
+        # encode or emit never stalls frame capture. Capture blocks on camera I/O,
+        # which is why it doesn't run on the shared SensorScheduler.
+        threading.Thread(target=self._capture_loop, daemon=True).start()
+        threading.Thread(target=self._encode_loop, daemon=True).start()
+        threading.Thread(target=self._send_loop, daemon=True).start()
+
+    async def start_monitoring_async(self, callback: Optional[Callable] = None):
+        """
+        Asyncio variant of start_monitoring; runs until stop_monitoring is called.
+        
+        Captures are paced on the event loop and the blocking camera read runs in
+        the default executor. The encode and send stages, which block on their
+        slots, run on executor threads. The callback may be a coroutine function;
+        processed frames arriving on the ML server client thread are handed to it
+        on the event loop.
+        
+        Args:
+            callback: Optional (async) callback function to receive frame data
+        """
+        loop = asyncio.get_running_loop()
+        if callback:
+            self.callback = threadsafe_callback(callback, loop)
+        
+        if not await loop.run_in_executor(None, self._open_pipeline):
+            return
+        
+        stages = [loop.run_in_executor(None, self._encode_loop),
+                  loop.run_in_executor(None, self._send_loop)]
+        
+        while not self._stop_event.is_set():
+            try:
+                delay = self._scheduler.seconds_until_due()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                    continue
+                self._scheduler.due()
+                
+                ret, frame = await loop.run_in_executor(None, self.source.read)
+                if not ret:
+                    logging.warning("Failed to capture frame")
+                    await asyncio.sleep(0.5)
+                    continue
+                
+                self._stage_frames['capture'] += 1
+                self._raw_frames.put((frame, time.monotonic()))
+            
+            except Exception as e:
+                logging.error(f"Error in camera monitoring: {e}")
+                await asyncio.sleep(1)  # Pause briefly before continuing
+        
+        await asyncio.gather(*stages)
+        await loop.run_in_executor(None, self.cleanup)
+
+    def _open_pipeline(self):
+        """
+        Open the frame source, reset the pipeline and connect to the ML server.
+        
+        Returns:
+            bool: False if the module is already running or the source can't be opened
+        """
         with self._lock:
             if self.is_running:
                 logging.warning("Camera module is already running")
-                return
+                return False
             
-            # Connect to the camera
+            # Connect to the camera (or file/synthetic source)
             try:
-                self.cap = cv2.VideoCapture(self.camera_index)
-                if not self.cap.isOpened():
-                    logging.error(f"Failed to open camera at index {self.camera_index}")
-                    return
+                if not self.source.open():
+                    logging.error(f"Failed to open frame source {self.source}")
+                    return False
             except Exception as e:
                 logging.error(f"Error opening camera: {e}")
-                return
-        
-        # Set resolution
-        self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, self.resolution[0])
-        self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, self.resolution[1])
+                return False
         
-        # Reset stop event
+        # Reset stop event and pipeline slots
         self._stop_event.clear()
+        self._raw_frames.clear()
+        self._encoded_frames.clear()
+        self._scheduler.reset()
         self.is_running = True
     
         # Try to connect to ML server, but continue even if it fails
         self._connect_to_ml_server()
-        
-        # Main capture loop
-        threading.Thread(target=self._capture_loop, daemon=True).start()
+        return True
 
     def _capture_loop(self):
-        """Main loop for capturing and processing frames."""
+        """
+        Capture stage: keep the driver buffer drained and publish the newest frame.
+
+        Frames are grabbed continuously so the camera driver never accumulates stale
+        frames; only when a capture is due is the newest one decoded and handed to
+        the encoder stage. Sources whose grab() doesn't block (files or synthetic
+        frames played unpaced) are only grabbed when a capture is due.
+        """
         while not self._stop_event.is_set():
             try:
-                # Capture frame
-                ret, frame = self.cap.read()
-                if not ret:
+                if not self.source.paced:
+                    # Nothing to drain and grab() returns at once: wait for the next
+                    # capture instead of spinning through frames
+                    if self._stop_event.wait(self._scheduler.seconds_until_due()):
+                        break
+
+                # Grab without decoding so the driver buffer never fills up
+                if not self.source.grab():
                     logging.warning("Failed to capture frame")
                     time.sleep(0.5)
                     continue
-                
-                # Convert to base64 (do this only once)
-                _, buffer = cv2.imencode('.jpg', frame)
-                base64_frame = base64.b64encode(buffer).decode('utf-8')
-                frame_data = f'data:image/jpeg;base64,{base64_frame}'
-                
-                # Process based on ML server connection status
-                if not self.ml_server_connected:
-                    # If ML server not connected, try to reconnect periodically
-                    # but don't send raw frames to frontend
-                    if not hasattr(self, '_last_reconnect_attempt') or \
-                       time.time() - self._last_reconnect_attempt > 30:
-                        self._reconnect_to_ml_server()
-                else:
-                    # If connected to ML server, send frame for processing
-                    # The processed frame will be returned via the processed_frame event
-                    try:
-                        self.sio.emit('frame', frame_data)
-                    except Exception as e:
-                        logging.error(f"Error sending frame to ML server: {e}")
-                        self.ml_server_connected = False
-                        # No longer sending raw frames as fallback
-                
-                # Wait for next capture
-                time.sleep(self.capture_interval)
+
+                if not self._scheduler.due():
+                    continue
+
+                ret, frame = self.source.retrieve()
+                if not ret:
+                    logging.warning("Failed to capture frame")
+                    continue
+
+                self._stage_frames['capture'] += 1
+                self._raw_frames.put((frame, time.monotonic()))
                 
             except Exception as e:
                 logging.error(f"Error in camera monitoring: {e}")
@@ -173,6 +345,216 @@ class CameraModule:
         
         self.cleanup()
 
+    def _encode_loop(self):
+        """Encode stage: turn the newest captured frame into an ML server payload."""
+        while not self._stop_event.is_set():
+            item = self._raw_frames.get(timeout=0.5)
+            if item is None:
+                continue
+            frame, captured = item
+
+            # Nothing to send to, so don't spend CPU encoding
+            if not self.ml_server_connected:
+                self._stage_dropped['encode'] += 1
+                continue
+
+            # Static scene: skip encoding and inference entirely
+            if self.motion_gate and not self.motion_gate.should_submit(frame):
+                continue
+
+            quality, scale = None, 1.0
+            if self.quality_controller:
+                quality, scale = self.quality_controller.quality, self.quality_controller.scale
+
+            self._frame_id += 1
+            started = time.monotonic()
+            trace = {'frame_id': self._frame_id, 'captured': captured, 'encode_start': started}
+            try:
+                payload = self._encode_frame(frame, self._frame_id, quality, scale, trace)
+            except Exception as e:
+                logging.error(f"Error encoding frame: {e}")
+                self._stage_dropped['encode'] += 1
+                continue
+
+            trace['encoded'] = time.monotonic()
+            if self.quality_controller:
+                size = len(payload) if isinstance(payload, str) else len(payload[1])
+                self.quality_controller.record_encode(trace['encoded'] - started, size)
+
+            self._stage_frames['encode'] += 1
+            self._encoded_frames.put((trace, payload))
+
+    def _send_loop(self):
+        """Send stage: emit the newest encoded frame and keep the ML server connection alive."""
+        while not self._stop_event.is_set():
+            if not self.ml_server_connected:
+                # If ML server not connected, try to reconnect periodically
+                # but don't send raw frames to frontend
+                if not hasattr(self, '_last_reconnect_attempt') or \
+                   time.time() - self._last_reconnect_attempt > 30:
+                    self._reconnect_to_ml_server()
+
+            # Backpressure: hold off while the in-flight window is full. Newer frames
+            # keep replacing the pending one in the slot in the meantime.
+            if not self._wait_for_window(timeout=0.5):
+                continue
+
+            item = self._encoded_frames.get(timeout=0.5)
+            if item is None:
+                continue
+            trace, payload = item
+
+            if not self.ml_server_connected:
+                self._stage_dropped['send'] += 1
+                continue
+
+            # Record before emitting so a fast reply can't race the bookkeeping.
+            # In binary mode the trace dict is also part of the metadata, so the
+            # 'sent' stamp goes out with the frame.
+            trace['sent'] = time.monotonic()
+            with self._window:
+                self._in_flight[trace['frame_id']] = trace
+
+            # The processed frame will be returned via the processed_frame event
+            try:
+                self.sio.emit('frame', payload)
+                self._stage_frames['send'] += 1
+            except Exception as e:
+                logging.error(f"Error sending frame to ML server: {e}")
+                self._stage_dropped['send'] += 1
+                self.ml_server_connected = False
+                with self._window:
+                    self._in_flight.pop(trace['frame_id'], None)
+
+    def _window_open(self):
+        """
+        Expire lost frames and check for room in the in-flight window (call with _window held).
+
+        Lost frames are expired even without a limit, so the bookkeeping can't grow
+        while the ML server doesn't answer.
+        """
+        now = time.monotonic()
+        deadline = now - self.in_flight_timeout
+        while self._in_flight:
+            frame_id, trace = next(iter(self._in_flight.items()))
+            if trace['sent'] > deadline:
+                break
+            del self._in_flight[frame_id]
+            self._in_flight_expired += 1
+            logging.warning(f"No processed_frame for frame {frame_id}, releasing it from the in-flight window")
+            # A lost or very late reply is the strongest congestion signal there is
+            if self.quality_controller:
+                self.quality_controller.record_round_trip(now - trace['sent'], now)
+        return self.max_in_flight is None or len(self._in_flight) < self.max_in_flight
+
+    def _wait_for_window(self, timeout: float):
+        """Wait up to timeout seconds for room in the in-flight window."""
+        with self._window:
+            return self._window.wait_for(self._window_open, timeout)
+
+    def _complete_in_flight(self, frame_id):
+        """
+        Release a frame from the in-flight window once the ML server has answered it.
+
+        ML servers that don't echo frame_id are assumed to answer in order, so the
+        oldest in-flight frame is released instead.
+
+        Returns:
+            dict: The frame's trace with a 'received' stamp added, or None if the
+                  frame was not in flight (already expired, or unknown)
+        """
+        trace = None
+        with self._window:
+            if frame_id is not None and frame_id in self._in_flight:
+                trace = self._in_flight.pop(frame_id)
+            elif frame_id is None and self._in_flight:
+                _, trace = self._in_flight.popitem(last=False)
+            self._window.notify_all()
+
+        if trace is None:
+            return None
+        trace['received'] = time.monotonic()
+        if self.quality_controller:
+            self.quality_controller.record_round_trip(trace['received'] - trace['sent'])
+        return trace
+
+    def get_pipeline_stats(self):
+        """
+        Get per-stage frame counters for the capture/encode/send pipeline.
+
+        A stage's 'dropped' count is the number of frames it produced or received
+        that never made it to the next stage (replaced by a newer frame, or
+        discarded while the ML server was unreachable). Frames skipped by the
+        motion gate are reported separately as 'gated'.
+
+        Returns:
+            dict: {stage: {'frames': int, 'dropped': int, ...}}, where the capture
+                  stage also reports target_fps, achieved_fps and missed_deadlines,
+                  plus 'quality' with the adaptive quality controller state (or None)
+        """
+        return {
+            'capture': {
+                'frames': self._stage_frames['capture'],
+                'dropped': self._raw_frames.dropped,
+                **self._scheduler.get_stats()
+            },
+            'encode': {
+                'frames': self._stage_frames['encode'],
+                'dropped': self._stage_dropped['encode'] + self._encoded_frames.dropped,
+                'gated': self.motion_gate.frames_gated if self.motion_gate else 0
+            },
+            'send': {
+                'frames': self._stage_frames['send'],
+                'dropped': self._stage_dropped['send'],
+                'in_flight': len(self._in_flight),
+                'max_in_flight': self.max_in_flight,
+                'expired': self._in_flight_expired
+            },
+            'quality': self.quality_controller.get_stats() if self.quality_controller else None
+        }
+
+    @staticmethod
+    def _target_fps(fps, capture_interval):
+        """Capture rate implied by the fps cap and capture interval (None if unpaced)."""
+        rates = [rate for rate in (fps, 1.0 / capture_interval if capture_interval else None) if rate]
+        return min(rates) if rates else None
+
+    def _encode_frame(self, frame, frame_id: int, quality: Optional[int] = None, scale: float = 1.0,
+                      trace: Optional[dict] = None):
+        """
+        Encode a captured frame into the payload emitted with the 'frame' event.
+
+        In binary mode the payload is a (metadata, image_bytes) tuple, which Socket.IO
+        sends as two event arguments with the JPEG as a binary attachment. The ML
+        server should echo metadata['frame_id'] in its processed_frame reply. In data
+        URI mode it is the legacy 'data:image/jpeg;base64,...' string.
+
+        Args:
+            frame: Captured BGR frame
+            frame_id: Id the ML server echoes back with the processed frame
+            quality: JPEG quality (0-100), or None for the encoder default
+            scale: Downscale factor applied before encoding
+            trace: Per-frame stage timestamps, sent along in the metadata so the ML
+                   server can echo them back
+        """
+        frame = self.encoder.resize(frame, scale)
+        buffer = self.encoder.encode(frame, quality)
+        if self.transport == self.TRANSPORT_DATA_URI:
+            base64_frame = base64.b64encode(buffer).decode('utf-8')
+            return f'data:{self.encoder.mime_type};base64,{base64_frame}'
+
+        height, width = frame.shape[:2]
+        metadata = {
+            'frame_id': frame_id,
+            'timestamp': time.time(),
+            'resolution': [width, height],
+            'format': self.encoder.format,
+            'quality': quality,
+            'trace': trace
+        }
+        # Socket.IO only sends bytes (not NumPy buffers) as a binary attachment;
+        # TurboJPEG and passthrough output already is bytes and isn't copied again
+        return (metadata, buffer if isinstance(buffer, bytes) else bytes(buffer))
     
     def _connect_to_ml_server(self):
         """Attempt to connect to ML server"""
@@ -203,8 +585,8 @@ class CameraModule:
             self.is_running = False
             
             # Release camera
-            if self.cap and self.cap.isOpened():
-                self.cap.release()
+            if self.source.is_opened():
+                self.source.release()
             
             # Disconnect from Socket.IO server
             if self.sio.connected:
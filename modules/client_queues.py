@@ -0,0 +1,199 @@
+import threading
+from collections import deque
+from typing import Callable, Optional
+
+# Events that are never dropped, however far behind a client is
+NEVER_DROP = frozenset(('camera_alert', 'water_level_alert', 'rain_alert', 'smoke_alert', 'snapshot'))
+
+# Events where only the newest few queued ones are worth sending (latest wins)
+LATEST_ONLY = {
+    'camera_data': 1,
+    'water_level_forecast': 1
+}
+
+
+class ClientQueue:
+    """Bounded outbound queue of one client, with per-event drop policies."""
+
+    def __init__(self, max_depth: int):
+        self.max_depth = max_depth
+        self.items = deque()
+        self.sent = 0
+        self.dropped = {}
+        self.max_seen = 0
+        self.transport_depth = 0
+
+    def _drop(self, index: int):
+        event = self.items[index][0]
+        del self.items[index]
+        self.dropped[event] = self.dropped.get(event, 0) + 1
+
+    def put(self, event: str, payload):
+        """
+        Queue an event, dropping older ones according to the event's policy.
+
+        LATEST_ONLY events replace their oldest queued copies. Anything else that
+        would exceed max_depth pushes out the oldest droppable event; alerts are
+        queued even past max_depth if nothing else can go.
+        """
+        limit = LATEST_ONLY.get(event)
+        if limit is not None:
+            queued = [i for i, (name, _) in enumerate(self.items) if name == event]
+            for i in reversed(queued[:max(0, len(queued) - limit + 1)]):
+                self._drop(i)
+
+        if len(self.items) >= self.max_depth:
+            droppable = next((i for i, (name, _) in enumerate(self.items) if name not in NEVER_DROP), None)
+            if droppable is not None:
+                self._drop(droppable)
+            elif event not in NEVER_DROP:
+                self.dropped[event] = self.dropped.get(event, 0) + 1
+                return
+
+        self.items.append((event, payload))
+        self.max_seen = max(self.max_seen, len(self.items))
+
+
+class ClientQueueManager:
+    """
+    Per-client send queues so one slow client can't hold up or bloat fan-out.
+
+    Broadcasts are put on every recipient's own bounded queue. A dispatcher hands an
+    event to the Socket.IO transport only while that client's transport queue is
+    nearly empty; a client on a bad link therefore accumulates events here, where
+    the drop policies apply (stale camera frames are replaced, alerts are kept),
+    instead of in the transport's unbounded queue. Healthy clients are served
+    immediately regardless.
+    """
+
+    def __init__(self, max_depth: int = 32, max_transport_depth: int = 2):
+        """
+        Initialize the manager.
+
+        Args:
+            max_depth: Events queued per client before older ones are dropped (default: 32)
+            max_transport_depth: Packets allowed in a client's transport queue before
+                                 it counts as busy (default: 2)
+        """
+        self.max_depth = max_depth
+        self.max_transport_depth = max_transport_depth
+        self.on_put = None
+        self._clients = {}
+        self._cond = threading.Condition()
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def register(self, sid: str):
+        """Create a client's queue."""
+        with self._cond:
+            self._clients.setdefault(sid, ClientQueue(self.max_depth))
+
+    def unregister(self, sid: str):
+        """Drop a disconnected client's queue."""
+        with self._cond:
+            self._clients.pop(sid, None)
+
+    def put(self, sids, event: str, payload):
+        """
+        Queue an event for several clients.
+
+        Args:
+            sids: Session ids of the recipients
+            event: Event name
+            payload: The event's encoded Engine.IO packets, shared by all recipients
+        """
+        with self._cond:
+            for sid in sids:
+                queue = self._clients.get(sid)
+                if queue is not None:
+                    queue.put(event, payload)
+            self._cond.notify()
+        if self.on_put is not None:
+            self.on_put()
+
+    def take_ready(self, transport_depth: Callable[[str], int]):
+        """
+        Pop the events that can be handed to the transport now.
+
+        Args:
+            transport_depth: Returns the number of packets waiting in a client's
+                             transport queue
+
+        Returns:
+            list: (sid, event, payload) in per-client queue order
+        """
+        ready = []
+        with self._cond:
+            for sid, queue in self._clients.items():
+                if not queue.items:
+                    continue
+                queue.transport_depth = transport_depth(sid)
+                room = self.max_transport_depth - queue.transport_depth
+                while room > 0 and queue.items:
+                    event, payload = queue.items.popleft()
+                    ready.append((sid, event, payload))
+                    queue.sent += 1
+                    room -= 1
+        return ready
+
+    def has_pending(self) -> bool:
+        """Whether any client still has queued events."""
+        with self._cond:
+            return any(queue.items for queue in self._clients.values())
+
+    def start(self, send_fn: Callable, transport_depth: Callable[[str], int], poll_interval: float = 0.02):
+        """
+        Dispatch queued events from a background thread.
+
+        Args:
+            send_fn: Called as send_fn(sid, event, payload) to write the packets to
+                     one client's transport
+            transport_depth: See take_ready
+            poll_interval: Seconds between re-checks while only busy clients have
+                           events queued (default: 0.02)
+        """
+        self._stop_event.clear()
+
+        def run():
+            while not self._stop_event.is_set():
+                ready = self.take_ready(transport_depth)
+                for sid, event, payload in ready:
+                    send_fn(sid, event, payload)
+                if ready:
+                    continue
+                with self._cond:
+                    if self._stop_event.is_set():
+                        return
+                    self._cond.wait(poll_interval if self.has_pending() else None)
+
+        self._thread = threading.Thread(target=run, name='client-queues', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop the dispatcher thread."""
+        self._stop_event.set()
+        with self._cond:
+            self._cond.notify()
+        if self._thread:
+            self._thread.join(timeout=5)
+
+    def get_stats(self, sid: Optional[str] = None):
+        """
+        Get per-client queue metrics.
+
+        Returns:
+            dict: {sid: {'depth', 'max_depth_seen', 'transport_depth', 'sent',
+                         'dropped': {event: count}}}
+        """
+        with self._cond:
+            return {
+                client: {
+                    'depth': len(queue.items),
+                    'max_depth_seen': queue.max_seen,
+                    'transport_depth': queue.transport_depth,
+                    'sent': queue.sent,
+                    'dropped': dict(queue.dropped)
+                }
+                for client, queue in self._clients.items()
+                if sid is None or client == sid
+            }
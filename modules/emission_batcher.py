@@ -0,0 +1,180 @@
+import threading
+import time
+from typing import Callable, Optional
+from modules.subscriptions import room_for
+from modules.wire_format import DEFAULT_FORMAT, format_room
+
+# Streams whose readings can be batched; camera frames and alerts are always sent at once
+BATCHED_STREAMS = ('water_level', 'rain', 'smoke')
+
+
+class SensorBatcher:
+    """
+    Coalesces sensor readings into one 'sensor_batch' message per client per window.
+
+    Clients opt in when they connect. Their batched streams are tracked here, and
+    they're put in a room per distinct combination of streams and wire format (e.g.
+    'batch:rain,water_level' or 'batch:smoke:msgpack') instead of the per-stream
+    rooms. Each window, every combination room gets one message with all readings of
+    its streams, in arrival order. The message is encoded once per combination room
+    and the same packets are queued for each of its clients.
+    Clients that didn't opt in keep getting the individual events.
+    """
+
+    def __init__(self, window: float = 0.1):
+        """
+        Initialize the batcher.
+
+        Args:
+            window: Seconds readings are collected before a batch is sent (default: 0.1)
+        """
+        self.window = window
+        self.batches_sent = 0
+        self.readings_batched = 0
+        self._pending = []
+        self._clients = {}
+        self._rooms = {}
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    @staticmethod
+    def room_name(streams, fmt: str = DEFAULT_FORMAT) -> Optional[str]:
+        """Room for clients batching exactly these streams in a format (None if there are none)."""
+        streams = sorted(set(streams).intersection(BATCHED_STREAMS))
+        return format_room('batch:' + ','.join(streams), fmt) if streams else None
+
+    def is_batched(self, sid: str) -> bool:
+        """Whether a client opted into batches."""
+        with self._lock:
+            return sid in self._clients
+
+    def client_streams(self, sid: str) -> set:
+        """Streams a batching client currently gets in its batches."""
+        with self._lock:
+            streams, _ = self._clients.get(sid, ((), None))
+            return set(streams)
+
+    def set_client(self, sid: str, streams, fmt: Optional[str] = None):
+        """
+        Set the streams a batching client gets, registering it if needed.
+
+        Args:
+            sid: Socket.IO session id
+            streams: Stream names; only BATCHED_STREAMS are kept
+            fmt: Wire format of the client's batches (default: keep the current one,
+                 JSON for a new client)
+
+        Returns:
+            tuple: (room to leave, room to join), either may be None
+        """
+        streams = frozenset(streams).intersection(BATCHED_STREAMS)
+        with self._lock:
+            if fmt is None:
+                fmt = self._clients.get(sid, (None, DEFAULT_FORMAT))[1]
+            old_room = self._release(sid)
+            self._clients[sid] = (streams, fmt)
+            new_room = self.room_name(streams, fmt)
+            if new_room is not None:
+                count = self._rooms.get(new_room, (0,))[0]
+                self._rooms[new_room] = (count + 1, streams, fmt)
+        if old_room == new_room:
+            return None, None
+        return old_room, new_room
+
+    def remove_client(self, sid: str) -> Optional[str]:
+        """Forget a client; returns the room it should leave."""
+        with self._lock:
+            room = self._release(sid)
+            self._clients.pop(sid, None)
+            return room
+
+    def _release(self, sid: str) -> Optional[str]:
+        """Drop a client's room membership count (call with _lock held)."""
+        if sid not in self._clients:
+            return None
+        streams, fmt = self._clients[sid]
+        room = self.room_name(streams, fmt)
+        if room is not None:
+            count, streams, fmt = self._rooms[room]
+            if count > 1:
+                self._rooms[room] = (count - 1, streams, fmt)
+            else:
+                del self._rooms[room]
+        return room
+
+    def add(self, event: str, data: dict):
+        """
+        Queue a reading for the next batch (dropped if no batching client wants it).
+
+        Args:
+            event: Event name the reading would be emitted as (e.g. 'rain_sensor_reading')
+            data: Event payload
+        """
+        stream = room_for(event)
+        with self._lock:
+            if any(stream in streams for streams, _ in self._clients.values()):
+                self._pending.append((stream, event, data))
+
+    def take_batches(self):
+        """
+        Build this window's messages and clear the queue.
+
+        Returns:
+            list: (room, format, payload) per combination room with readings; payload
+                  is {'timestamp': float, 'readings': [{'event': str, 'data': dict}, ...]}
+        """
+        with self._lock:
+            pending, self._pending = self._pending, []
+            rooms = [(room, streams, fmt) for room, (_, streams, fmt) in self._rooms.items()]
+        if not pending:
+            return []
+
+        now = time.time()
+        batches = []
+        for room, streams, fmt in rooms:
+            readings = [{'event': event, 'data': data} for stream, event, data in pending if stream in streams]
+            if readings:
+                batches.append((room, fmt, {'timestamp': now, 'readings': readings}))
+                self.readings_batched += len(readings)
+        self.batches_sent += len(batches)
+        return batches
+
+    def start(self, emit_fn: Callable):
+        """
+        Send batches from a background thread every window.
+
+        Args:
+            emit_fn: Called as emit_fn(room, format, payload) for every batch
+        """
+        self._stop_event.clear()
+
+        def run():
+            while not self._stop_event.wait(self.window):
+                for room, fmt, payload in self.take_batches():
+                    emit_fn(room, fmt, payload)
+
+        self._thread = threading.Thread(target=run, name='sensor-batcher', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop the background thread."""
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+
+    def get_stats(self):
+        """
+        Get batching counters.
+
+        Returns:
+            dict: window, batching clients, combination rooms, batches and readings sent
+        """
+        with self._lock:
+            return {
+                'window': self.window,
+                'clients': len(self._clients),
+                'rooms': len(self._rooms),
+                'batches_sent': self.batches_sent,
+                'readings_batched': self.readings_batched
+            }
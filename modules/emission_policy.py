@@ -0,0 +1,114 @@
+import threading
+import time
+from typing import Optional
+
+
+class EmissionPolicy:
+    """
+    Decides which readings of one sensor are worth broadcasting to clients.
+
+    A reading is emitted when one of its change_keys (e.g. an alert flag) differs
+    from the last emitted reading, when its value has moved more than deadband away
+    from the last emitted value, or when heartbeat seconds have passed since the last
+    emission. Everything else is suppressed.
+
+    Every reading gets a per-sensor sequence number. Emitted readings carry 'seq',
+    'suppressed' (readings skipped since the previous emission) and
+    'suppressed_samples' (raw samples those readings covered). A client can therefore
+    tell exactly which readings it didn't get, and knows they stayed within deadband
+    of the previous emitted value.
+    """
+
+    def __init__(self, deadband: float = 0.0, heartbeat: Optional[float] = 30.0, change_keys: tuple = ()):
+        """
+        Initialize the policy.
+
+        Args:
+            deadband: Minimum change in 'value' that triggers an emission (default: 0,
+                      i.e. any change)
+            heartbeat: Maximum seconds between emissions, None for change-only (default: 30)
+            change_keys: Reading keys whose change always triggers an emission
+        """
+        self.deadband = deadband
+        self.heartbeat = heartbeat
+        self.change_keys = change_keys
+
+        self.seq = 0
+        self.emitted = 0
+        self.suppressed_total = 0
+        self._last = None
+        self._last_emit = 0.0
+        self._suppressed = 0
+        self._suppressed_samples = 0
+        self._lock = threading.Lock()
+
+    def _should_emit(self, data: dict, now: float) -> bool:
+        if self._last is None:
+            return True
+        if any(data.get(key) != self._last.get(key) for key in self.change_keys):
+            return True
+        value, last_value = data.get('value'), self._last.get('value')
+        if value is None or last_value is None:
+            return value != last_value
+        if abs(value - last_value) > self.deadband:
+            return True
+        return self.heartbeat is not None and now - self._last_emit >= self.heartbeat
+
+    def filter(self, data: dict) -> Optional[dict]:
+        """
+        Run a reading through the policy.
+
+        Args:
+            data: Sensor reading with a 'value' key
+
+        Returns:
+            dict: A copy of the reading annotated with seq/suppressed/suppressed_samples
+                  if it should be emitted, otherwise None
+        """
+        now = time.monotonic()
+        with self._lock:
+            self.seq += 1
+            if not self._should_emit(data, now):
+                self._suppressed += 1
+                self._suppressed_samples += data.get('sample_count', 1)
+                self.suppressed_total += 1
+                return None
+
+            emitted = dict(data, seq=self.seq, suppressed=self._suppressed,
+                           suppressed_samples=self._suppressed_samples)
+            self._last = data
+            self._last_emit = now
+            self._suppressed = 0
+            self._suppressed_samples = 0
+            self.emitted += 1
+            return emitted
+
+    def heartbeat_due(self, now: Optional[float] = None) -> bool:
+        """
+        Whether heartbeat seconds have passed since the last emission.
+
+        Change-only sensors (edge-triggered GPIO) produce no readings while their
+        state holds, so something has to re-read them for the heartbeat to go out.
+
+        Args:
+            now: time.monotonic() timestamp (default: now)
+        """
+        if self.heartbeat is None:
+            return False
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            return self._last is not None and now - self._last_emit >= self.heartbeat
+
+    def get_stats(self):
+        """
+        Get emission counters.
+
+        Returns:
+            dict: readings seen (seq), emitted and suppressed counts
+        """
+        with self._lock:
+            return {
+                'seq': self.seq,
+                'emitted': self.emitted,
+                'suppressed': self.suppressed_total
+            }
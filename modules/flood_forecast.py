@@ -0,0 +1,175 @@
+import threading
+import time
+from typing import Optional
+from modules.ring_buffer import RingBuffer
+
+
+class RateOfRiseForecaster:
+    """
+    Streaming flood forecast from the water level rate of rise.
+
+    Fits a least-squares line to the readings of the last window seconds and
+    projects when the water will reach the threshold. The fit is kept as running
+    sums (n, Σt, Σv, Σt², Σtv) that each new reading adds to and each expired
+    reading subtracts from, so an update is O(1) whatever the window holds. The
+    readings themselves live in the sensor's ring buffer (WaterLevelSensor.recent):
+    update() records each one there, and expired readings are read back from it by
+    sample number. Readings the buffer is about to overwrite are expired first, so
+    the window is cut short if the buffer holds less than window seconds. Times
+    are stored relative to a reference that is moved forward once it falls a few
+    windows behind (the sums are rebuilt then), which keeps the sums small enough
+    for float64 precision.
+    """
+
+    def __init__(self,
+                 threshold: float,
+                 buffer: RingBuffer,
+                 window: float = 600.0,
+                 min_samples: int = 10,
+                 min_span: float = 30.0,
+                 warning_horizon: float = 1800.0,
+                 emit_interval: float = 5.0):
+        """
+        Initialize the forecaster.
+
+        Args:
+            threshold: Water level treated as flooding
+            buffer: Ring buffer the readings are recorded in (only update() may
+                    append to it, or the sums lose track of its samples)
+            window: Seconds of readings the trend is fitted over (default: 600)
+            min_samples: Readings needed before forecasting (default: 10)
+            min_span: Seconds the readings must span before forecasting (default: 30)
+            warning_horizon: Warn when the threshold is projected within this many
+                             seconds (default: 1800)
+            emit_interval: Minimum seconds between forecasts returned by poll()
+                           unless the warning state changes (default: 5)
+        """
+        self.threshold = threshold
+        self.buffer = buffer
+        self.window = window
+        self.min_samples = min_samples
+        self.min_span = min_span
+        self.warning_horizon = warning_horizon
+        self.emit_interval = emit_interval
+
+        # Buffer sample number of the oldest reading in the sums
+        self._first = buffer.count
+        self._oldest = None
+        self._newest = None
+        self._ref = None
+        self._n = 0
+        self._st = self._sv = self._stt = self._stv = 0.0
+        self._last_emit = 0.0
+        self._last_warning = False
+        self._lock = threading.Lock()
+
+    def _add(self, t: float, v: float, sign: int):
+        self._n += sign
+        self._st += sign * t
+        self._sv += sign * v
+        self._stt += sign * t * t
+        self._stv += sign * t * v
+
+    def _rebase(self, ref: float):
+        """Move the time reference and rebuild the sums from the window (rare, O(window))."""
+        self._ref = ref
+        self._n = 0
+        self._st = self._sv = self._stt = self._stv = 0.0
+        for number in range(self._first, self.buffer.count):
+            ts, value = self.buffer.sample(number)
+            self._add(ts - ref, value, 1)
+
+    def update(self, timestamp: float, value: float):
+        """
+        Record a reading in the buffer and drop the ones that fell out of the window.
+
+        Args:
+            timestamp: Reading time in seconds since the epoch
+            value: Water level reading
+        """
+        with self._lock:
+            if self._ref is None:
+                self._ref = timestamp
+            cutoff = timestamp - self.window
+            # The append below overwrites sample count - capacity once the buffer is full
+            overwritten = self.buffer.count - self.buffer.capacity
+            while self._first < self.buffer.count:
+                ts, old = self.buffer.sample(self._first)
+                if ts >= cutoff and self._first > overwritten:
+                    break
+                self._add(ts - self._ref, old, -1)
+                self._first += 1
+
+            self.buffer.append(timestamp, value)
+            self._add(timestamp - self._ref, value, 1)
+            self._oldest = self.buffer.sample(self._first)[0]
+            self._newest = timestamp
+
+            if timestamp - self._ref > 4 * self.window:
+                self._rebase(self._oldest)
+
+    def forecast(self):
+        """
+        Current trend and projection.
+
+        Returns:
+            dict: 'timestamp', 'level' (fitted current level), 'rate' (units per
+                  minute), 'threshold', 'time_to_threshold' (seconds; 0 if already at
+                  or above it, None if not rising or not enough data), 'eta' (epoch
+                  seconds or None), 'warning' and 'sample_count'
+        """
+        with self._lock:
+            n = self._n
+            newest = self._newest
+            span = newest - self._oldest if n else 0.0
+            denominator = n * self._stt - self._st * self._st
+            if n < self.min_samples or span < self.min_span or denominator <= 0:
+                return {
+                    'timestamp': time.time(),
+                    'level': None,
+                    'rate': None,
+                    'threshold': self.threshold,
+                    'time_to_threshold': None,
+                    'eta': None,
+                    'warning': False,
+                    'sample_count': n
+                }
+            rate = (n * self._stv - self._st * self._sv) / denominator
+            intercept = (self._sv - rate * self._st) / n
+            level = intercept + rate * (newest - self._ref)
+
+        if level >= self.threshold:
+            time_to_threshold = 0.0
+        elif rate > 0:
+            time_to_threshold = (self.threshold - level) / rate
+        else:
+            time_to_threshold = None
+
+        return {
+            'timestamp': time.time(),
+            'level': round(level, 2),
+            'rate': round(rate * 60, 4),
+            'threshold': self.threshold,
+            'time_to_threshold': round(time_to_threshold, 1) if time_to_threshold is not None else None,
+            'eta': newest + time_to_threshold if time_to_threshold is not None else None,
+            'warning': time_to_threshold is not None and time_to_threshold <= self.warning_horizon,
+            'sample_count': n
+        }
+
+    def poll(self) -> Optional[dict]:
+        """
+        Forecast to emit now, rate limited to one per emit_interval.
+
+        Returns:
+            dict: The forecast if emit_interval has passed or the warning state
+                  changed since the last one returned, otherwise None
+        """
+        now = time.monotonic()
+        forecast = self.forecast()
+        warning_changed = forecast['warning'] != self._last_warning
+        if not warning_changed and now - self._last_emit < self.emit_interval:
+            return None
+        forecast['warning_changed'] = warning_changed
+        self._last_warning = forecast['warning']
+        self._last_emit = now
+        return forecast
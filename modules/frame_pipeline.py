@@ -0,0 +1,150 @@
+import threading
+import time
+from collections import deque
+from typing import Any, Optional
+
+
+class LatestFrameSlot:
+    """
+    Single-item hand-off between two stages of the camera pipeline.
+
+    The producer never blocks: putting an item while the previous one has not been
+    taken yet replaces it ("latest wins") and counts the replaced item as dropped.
+    This keeps every stage working on the freshest frame instead of a backlog.
+    """
+
+    def __init__(self, name: str):
+        """
+        Initialize the slot.
+
+        Args:
+            name: Name of the stage feeding this slot (used in stats)
+        """
+        self.name = name
+        self.dropped = 0
+        self._item = None
+        self._has_item = False
+        self._cond = threading.Condition()
+
+    def put(self, item: Any):
+        """Store an item, replacing (and counting as dropped) any pending one."""
+        with self._cond:
+            if self._has_item:
+                self.dropped += 1
+            self._item = item
+            self._has_item = True
+            self._cond.notify()
+
+    def get(self, timeout: Optional[float] = None):
+        """
+        Take the pending item, waiting up to timeout seconds for one to arrive.
+
+        Returns:
+            The newest item, or None if the slot stayed empty
+        """
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._has_item, timeout):
+                return None
+            item = self._item
+            self._item = None
+            self._has_item = False
+            return item
+
+    def clear(self):
+        """Discard any pending item without counting it as dropped."""
+        with self._cond:
+            self._item = None
+            self._has_item = False
+
+
+class FrameScheduler:
+    """
+    Deadline-based pacing for a fixed frame rate.
+
+    Deadlines are laid out on the monotonic clock at start + n * period, so the time
+    spent handling a frame never accumulates into drift. If the caller falls behind
+    by a whole period or more, the missed deadlines are skipped (and counted) instead
+    of being fired back to back.
+    """
+
+    def __init__(self, target_fps: Optional[float], window: float = 5.0):
+        """
+        Initialize the scheduler.
+
+        Args:
+            target_fps: Frames per second to pace at (None or 0 for unpaced)
+            window: Seconds of recent ticks used to measure the achieved rate
+        """
+        self.target_fps = target_fps or None
+        self.period = 1.0 / target_fps if target_fps else 0.0
+        self.window = window
+        self.ticks = 0
+        self.missed_deadlines = 0
+        self._next_deadline = None
+        self._tick_times = deque()
+
+    def reset(self):
+        """Restart the schedule; the next call to due() fires immediately."""
+        self._next_deadline = None
+        self._tick_times.clear()
+
+    def due(self, now: Optional[float] = None) -> bool:
+        """
+        Non-blocking check: return True (and advance the schedule) if a deadline has passed.
+
+        Args:
+            now: Current monotonic time (default: time.monotonic())
+        """
+        now = time.monotonic() if now is None else now
+        if self._next_deadline is None:
+            self._next_deadline = now
+        if now < self._next_deadline:
+            return False
+        self._advance(now)
+        return True
+
+    def seconds_until_due(self, now: Optional[float] = None) -> float:
+        """Time left until the next deadline (0 if it has already passed)."""
+        now = time.monotonic() if now is None else now
+        if self._next_deadline is None:
+            return 0.0
+        return max(0.0, self._next_deadline - now)
+
+    def _advance(self, now: float):
+        """Record a tick and move the deadline forward, skipping any that were missed."""
+        self.ticks += 1
+        self._tick_times.append(now)
+        while self._tick_times and now - self._tick_times[0] > self.window:
+            self._tick_times.popleft()
+
+        if not self.period:
+            self._next_deadline = now
+            return
+
+        self._next_deadline += self.period
+        if self._next_deadline <= now:
+            missed = int((now - self._next_deadline) // self.period) + 1
+            self.missed_deadlines += missed
+            self._next_deadline += missed * self.period
+
+    @property
+    def achieved_fps(self) -> float:
+        """Rate measured over the recent tick window."""
+        if len(self._tick_times) < 2:
+            return 0.0
+        span = self._tick_times[-1] - self._tick_times[0]
+        return (len(self._tick_times) - 1) / span if span > 0 else 0.0
+
+    def get_stats(self):
+        """
+        Get pacing stats.
+
+        Returns:
+            dict: target_fps, achieved_fps, ticks and missed_deadlines
+        """
+        return {
+            'target_fps': self.target_fps,
+            'achieved_fps': round(self.achieved_fps, 2),
+            'ticks': self.ticks,
+            'missed_deadlines': self.missed_deadlines
+        }
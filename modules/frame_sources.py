@@ -0,0 +1,316 @@
+import os
+import time
+import cv2
+import numpy as np
+from typing import Optional
+from urllib.parse import parse_qs
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp')
+
+
+class FrameSource:
+    """
+    Base class for the frame sources CameraModule captures from.
+
+    The interface mirrors cv2.VideoCapture (grab / retrieve / read / release) so the
+    capture stage can keep grabbing to drain a live camera and only decode the frames
+    it actually uses. File-backed and synthetic sources either play back in real time
+    at fps, with grab() blocking until the next frame is due like a camera would, or
+    as fast as possible when realtime is False.
+    """
+
+    def __init__(self, fps: Optional[float] = None, realtime: bool = True):
+        """
+        Initialize the source.
+
+        Args:
+            fps: Playback rate in frames per second (None for the source's native rate)
+            realtime: Pace grab() at fps; False delivers frames as fast as possible
+        """
+        self.fps = fps
+        self.realtime = realtime
+        self._next_frame_at = None
+
+    @property
+    def paced(self) -> bool:
+        """Whether grab() blocks until the next frame, so grabbing in a loop can't spin."""
+        return bool(self.realtime and self.fps)
+
+    def open(self) -> bool:
+        """Open the source. Returns True on success."""
+        self._next_frame_at = None
+        return True
+
+    def is_opened(self) -> bool:
+        """Check whether the source is open."""
+        return True
+
+    def grab(self) -> bool:
+        """Advance to the next frame, waiting for it in real-time mode."""
+        if self.realtime and self.fps:
+            now = time.monotonic()
+            if self._next_frame_at is None or now - self._next_frame_at > 1.0:
+                # First frame, or we fell far behind: resynchronize instead of bursting
+                self._next_frame_at = now
+            elif self._next_frame_at > now:
+                time.sleep(self._next_frame_at - now)
+            self._next_frame_at += 1.0 / self.fps
+        return self._grab()
+
+    def retrieve(self):
+        """Decode the last grabbed frame. Returns (ok, frame) like cv2.VideoCapture."""
+        frame = self._retrieve()
+        return frame is not None, frame
+
+    def read(self):
+        """Grab and decode the next frame. Returns (ok, frame) like cv2.VideoCapture."""
+        if not self.grab():
+            return False, None
+        return self.retrieve()
+
+    def release(self):
+        """Release the source."""
+        pass
+
+    def _grab(self) -> bool:
+        raise NotImplementedError
+
+    def _retrieve(self):
+        raise NotImplementedError
+
+
+class CameraSource(FrameSource):
+    """Live camera through cv2.VideoCapture; the camera itself sets the pace."""
+
+    def __init__(self, camera_index: int = 0, resolution: tuple = (640, 480)):
+        super().__init__(fps=None, realtime=False)
+        self.camera_index = camera_index
+        self.resolution = resolution
+        self.cap = None
+
+    @property
+    def paced(self) -> bool:
+        return True
+
+    def open(self) -> bool:
+        super().open()
+        self.cap = cv2.VideoCapture(self.camera_index)
+        if not self.cap.isOpened():
+            return False
+        self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, self.resolution[0])
+        self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, self.resolution[1])
+        self.cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+        return True
+
+    def is_opened(self) -> bool:
+        return self.cap is not None and self.cap.isOpened()
+
+    def _grab(self) -> bool:
+        return self.cap.grab()
+
+    def _retrieve(self):
+        ret, frame = self.cap.retrieve()
+        return frame if ret else None
+
+    def release(self):
+        if self.cap is not None:
+            self.cap.release()
+
+    def __repr__(self):
+        return f"CameraSource({self.camera_index})"
+
+
+class VideoFileSource(FrameSource):
+    """Plays back a recorded video file, optionally looping at the end."""
+
+    def __init__(self, path: str, fps: Optional[float] = None, realtime: bool = True, loop: bool = True):
+        """
+        Args:
+            path: Video file path
+            fps: Playback rate (default: the file's own frame rate)
+            realtime: Pace playback at fps; False decodes as fast as possible
+            loop: Restart from the beginning at the end of the file
+        """
+        super().__init__(fps=fps, realtime=realtime)
+        self.path = path
+        self.loop = loop
+        self.cap = None
+
+    def open(self) -> bool:
+        super().open()
+        self.cap = cv2.VideoCapture(self.path)
+        if not self.cap.isOpened():
+            return False
+        if not self.fps:
+            self.fps = self.cap.get(cv2.CAP_PROP_FPS) or None
+        return True
+
+    def is_opened(self) -> bool:
+        return self.cap is not None and self.cap.isOpened()
+
+    def _grab(self) -> bool:
+        if self.cap.grab():
+            return True
+        if not self.loop:
+            return False
+        self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+        return self.cap.grab()
+
+    def _retrieve(self):
+        ret, frame = self.cap.retrieve()
+        return frame if ret else None
+
+    def release(self):
+        if self.cap is not None:
+            self.cap.release()
+
+    def __repr__(self):
+        return f"VideoFileSource({self.path!r})"
+
+
+class ImageDirectorySource(FrameSource):
+    """Plays back a directory of still images in file name order."""
+
+    def __init__(self, path: str, fps: Optional[float] = 12, realtime: bool = True, loop: bool = True,
+                 resolution: Optional[tuple] = None):
+        """
+        Args:
+            path: Directory holding .jpg/.png/.bmp frames
+            fps: Playback rate (default: 12)
+            realtime: Pace playback at fps; False delivers frames as fast as possible
+            loop: Restart from the first image after the last one
+            resolution: Optional (width, height) to resize every image to
+        """
+        super().__init__(fps=fps, realtime=realtime)
+        self.path = path
+        self.loop = loop
+        self.resolution = resolution
+        self._frames = []
+        self._index = -1
+
+    def open(self) -> bool:
+        super().open()
+        # Decode everything up front so playback measures the pipeline, not disk I/O
+        self._frames = []
+        for name in sorted(os.listdir(self.path)):
+            if name.lower().endswith(IMAGE_EXTENSIONS):
+                frame = cv2.imread(os.path.join(self.path, name))
+                if frame is None:
+                    continue
+                if self.resolution:
+                    frame = cv2.resize(frame, self.resolution, interpolation=cv2.INTER_AREA)
+                self._frames.append(frame)
+        self._index = -1
+        return bool(self._frames)
+
+    def is_opened(self) -> bool:
+        return bool(self._frames)
+
+    def _grab(self) -> bool:
+        if self._index + 1 >= len(self._frames):
+            if not self.loop:
+                return False
+            self._index = -1
+        self._index += 1
+        return True
+
+    def _retrieve(self):
+        return self._frames[self._index] if self._index >= 0 else None
+
+    def release(self):
+        self._frames = []
+
+    def __repr__(self):
+        return f"ImageDirectorySource({self.path!r})"
+
+
+class SyntheticNoiseSource(FrameSource):
+    """
+    Random noise frames for load tests with no recordings at hand.
+
+    A small pool of frames is generated up front and cycled, so producing a frame
+    costs nothing compared to the pipeline being measured. Every frame differs from
+    the previous one, so motion gating always lets them through.
+    """
+
+    def __init__(self, resolution: tuple = (640, 480), fps: Optional[float] = 12, realtime: bool = True,
+                 pool_size: int = 8, seed: int = 0):
+        super().__init__(fps=fps, realtime=realtime)
+        self.resolution = resolution
+        self.pool_size = pool_size
+        self.seed = seed
+        self._frames = []
+        self._index = -1
+
+    def open(self) -> bool:
+        super().open()
+        width, height = self.resolution
+        rng = np.random.default_rng(self.seed)
+        self._frames = [rng.integers(0, 256, (height, width, 3), dtype=np.uint8) for _ in range(self.pool_size)]
+        self._index = -1
+        return True
+
+    def is_opened(self) -> bool:
+        return bool(self._frames)
+
+    def _grab(self) -> bool:
+        self._index = (self._index + 1) % len(self._frames)
+        return True
+
+    def _retrieve(self):
+        return self._frames[self._index] if self._index >= 0 else None
+
+    def release(self):
+        self._frames = []
+
+    def __repr__(self):
+        return f"SyntheticNoiseSource({self.resolution[0]}x{self.resolution[1]})"
+
+
+def create_frame_source(spec=None, resolution: tuple = (640, 480), fps: Optional[float] = None,
+                        realtime: bool = True) -> FrameSource:
+    """
+    Create a frame source from a short spec string.
+
+    File and synthetic specs take playback options as a query string, which override
+    the fps and realtime arguments, e.g. 'video:clip.mp4?fps=15' or
+    'noise?realtime=0' (as fast as possible, for benchmarks).
+
+    Args:
+        spec: Camera index (int or digit string), 'video:<path>', 'images:<directory>'
+              or 'noise' (default: CAMERA_SOURCE environment variable, or camera 0)
+        resolution: Frame size (width, height) for cameras and synthetic frames
+        fps: Playback rate for file and synthetic sources
+        realtime: Pace file and synthetic sources at fps; False runs as fast as possible
+
+    Returns:
+        FrameSource: The (not yet opened) source
+
+    Raises:
+        ValueError: If the spec or one of its options is invalid
+    """
+    if spec is None:
+        spec = os.environ.get('CAMERA_SOURCE', 0)
+    if isinstance(spec, int) or str(spec).isdigit():
+        return CameraSource(int(spec), resolution)
+
+    spec, _, query = str(spec).partition('?')
+    for key, values in parse_qs(query).items():
+        if key == 'fps':
+            try:
+                fps = float(values[-1])
+            except ValueError:
+                raise ValueError(f"Invalid camera source fps: {values[-1]}")
+        elif key == 'realtime':
+            realtime = values[-1].lower() not in ('0', 'false', 'no', 'off')
+        else:
+            raise ValueError(f"Unknown camera source option: {key}")
+
+    kind, _, target = spec.partition(':')
+    if kind == 'video':
+        return VideoFileSource(target, fps=fps, realtime=realtime)
+    if kind == 'images':
+        return ImageDirectorySource(target, fps=fps or 12, realtime=realtime, resolution=resolution)
+    if kind == 'noise':
+        return SyntheticNoiseSource(resolution, fps=fps or 12, realtime=realtime)
+    raise ValueError(f"Unknown camera source: {spec}")
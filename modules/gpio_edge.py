@@ -0,0 +1,238 @@
+import asyncio
+import threading
+import time
+import RPi.GPIO as GPIO
+from modules.async_support import invoke_callback, threadsafe_callback
+from modules.ring_buffer import RingBuffer
+
+
+class EdgeTriggeredSensor:
+    """
+    Base class for digital sensors on a GPIO pin, read on pin edges or by polling.
+
+    Subclasses set up the pin, set name (scheduler task name) and label (for log
+    messages), and implement read_pin() and build_reading(value, timestamp).
+
+    Readings are delivered to the callback under one lock, in the order they were
+    read, whether they come from the interrupt thread, the debounce timer or a
+    heartbeat re-read.
+
+    The interrupt handler reads the pin first thing. If that read shows a new level
+    that is already gone again when the reading is taken, the level flipped and came
+    back faster than the callback latency: both transitions are reported then, the
+    first one marked 'pulse', so even a brief detection reaches the callback. An
+    interrupt whose first read shows the level last reported is treated as
+    chatter and ignored.
+    """
+
+    name = None
+    label = None
+
+    def __init__(self, pin: int, history_size: int = 3600):
+        """
+        Initialize the shared state.
+
+        Args:
+            pin: GPIO pin number (physical numbering)
+            history_size: Number of recent readings kept in memory in self.recent
+        """
+        self.pin = pin
+        self.is_running = False
+        self._stop_event = threading.Event()
+        self._scheduler = None
+        self.recent = RingBuffer(history_size)
+
+        # Edge detection state
+        self._edge_callback = None
+        self._edge_lock = threading.Lock()
+        self._last_state = None
+        self._debounce_ms = 50
+
+    def read_pin(self) -> int:
+        """Read the pin level (GPIO.LOW or GPIO.HIGH)."""
+        raise NotImplementedError
+
+    def build_reading(self, value: int, timestamp: float) -> dict:
+        """Turn a pin level into the data passed to the callback."""
+        raise NotImplementedError
+
+    def get_sensor_data(self):
+        """
+        Read the sensor and return formatted data.
+
+        Returns:
+            dict: Data containing sensor readings and status
+        """
+        return self.build_reading(self.read_pin(), time.time())
+
+    @property
+    def edge_triggered(self) -> bool:
+        """Whether readings are currently pushed by GPIO edge interrupts."""
+        return self._edge_callback is not None
+
+    def read_now(self):
+        """
+        Read the pin and pass the reading to the edge callback, changed or not.
+
+        Used for heartbeats: in edge mode nothing is read while the state holds.
+        No-op unless edge detection is enabled. Blocks while another reading is
+        being delivered, so don't call it on the event loop the callback runs on.
+        """
+        with self._edge_lock:
+            callback = self._edge_callback
+            if callback is None:
+                return
+            value = self.read_pin()
+            self._last_state = value
+            callback(self.build_reading(value, time.time()))
+
+    def enable_edge_detection(self, callback, debounce_ms=50):
+        """
+        Call the callback on every state change, driven by GPIO edge interrupts.
+
+        The callback fires as soon as an edge arrives. Further edges within the
+        debounce window are ignored, and the pin is re-read once the window has
+        passed so the settled state is never missed.
+
+        Args:
+            callback: Function to call with sensor data
+            debounce_ms: Debounce window in milliseconds (default: 50)
+
+        Returns:
+            bool: False if edge detection is unavailable on this pin
+        """
+        self._edge_callback = callback
+        self._debounce_ms = debounce_ms
+        self._last_state = None
+
+        try:
+            GPIO.add_event_detect(self.pin, GPIO.BOTH, callback=self._handle_edge, bouncetime=debounce_ms)
+        except RuntimeError as e:
+            print(f"{self.label} edge detection unavailable: {e}")
+            return False
+
+        # Report the initial state right away
+        self._emit_if_changed()
+        return True
+
+    def disable_edge_detection(self):
+        """Stop listening for GPIO edges."""
+        GPIO.remove_event_detect(self.pin)
+        self._edge_callback = None
+
+    def _handle_edge(self, channel):
+        """GPIO edge interrupt handler."""
+        # Read before waiting for the lock, as close to the edge as possible
+        seen, edge_time = self.read_pin(), time.time()
+        self._emit_if_changed(seen, edge_time)
+        # Re-check once the input has settled
+        timer = threading.Timer(self._debounce_ms / 1000.0, self._emit_if_changed)
+        timer.daemon = True
+        timer.start()
+
+    def _emit_if_changed(self, seen=None, edge_time=None):
+        """
+        Read the pin and call the edge callback if the state differs from the last one sent.
+
+        Args:
+            seen: Level the interrupt handler read right at the edge, None for the
+                  initial and the post-debounce reads
+            edge_time: Time of that read
+        """
+        with self._edge_lock:
+            callback = self._edge_callback
+            if callback is None:
+                return
+            value = self.read_pin()
+            readings = []
+            if seen is not None and seen != self._last_state and value != seen:
+                # The new level was read at the edge but is gone again: a short pulse
+                readings.append(dict(self.build_reading(seen, edge_time), pulse=True))
+            if readings or value != self._last_state:
+                readings.append(self.build_reading(value, time.time()))
+            self._last_state = value
+            for data in readings:
+                callback(data)
+
+    def start_monitoring(self, callback, interval=1.0, mode='edge', debounce_ms=50, scheduler=None):
+        """
+        Start monitoring the sensor and call the callback with readings.
+
+        In 'edge' mode readings are sent only when the sensor state changes, right
+        as the GPIO edge arrives, and this call just blocks until stopped. If edge
+        detection can't be set up, or in 'poll' mode, the sensor is read every
+        interval seconds instead.
+
+        Args:
+            callback: Function to call with sensor data
+            interval: Time between readings in seconds in poll mode (default: 1.0)
+            mode: 'edge' for interrupt-driven readings or 'poll' (default: 'edge')
+            debounce_ms: Debounce window for edge mode in milliseconds (default: 50)
+            scheduler: Optional SensorScheduler; when given, polling runs as a task
+                       named after the sensor on it and this call returns immediately
+        """
+        self.is_running = True
+        self._stop_event.clear()
+
+        if mode == 'edge':
+            if self.enable_edge_detection(callback, debounce_ms):
+                if scheduler is not None:
+                    # Interrupts drive the readings, nothing to schedule
+                    return
+                self._stop_event.wait()
+                self.disable_edge_detection()
+                return
+            print(f"{self.label} falling back to polling")
+
+        if scheduler is not None:
+            self._scheduler = scheduler
+            scheduler.add(self.name, lambda: callback(self.get_sensor_data()), interval)
+            return
+
+        while self.is_running:
+            callback(self.get_sensor_data())
+            self._stop_event.wait(interval)
+
+    async def start_monitoring_async(self, callback, interval=1.0, mode='edge', debounce_ms=50):
+        """
+        Asyncio variant of start_monitoring.
+
+        In 'edge' mode this returns as soon as edge detection is set up; readings
+        from GPIO interrupts are handed to the callback on the event loop. In 'poll'
+        mode (or as a fallback) it runs until stop_monitoring is called.
+
+        Args:
+            callback: Function or coroutine function to call with sensor data
+            interval: Time between readings in seconds in poll mode (default: 1.0)
+            mode: 'edge' for interrupt-driven readings or 'poll' (default: 'edge')
+            debounce_ms: Debounce window for edge mode in milliseconds (default: 50)
+        """
+        self.is_running = True
+        self._stop_event.clear()
+
+        if mode == 'edge':
+            loop = asyncio.get_running_loop()
+            # Off the loop: the initial reading is delivered under the edge lock and
+            # waits for the callback to run on the loop
+            if await loop.run_in_executor(None, self.enable_edge_detection,
+                                          threadsafe_callback(callback, loop), debounce_ms):
+                return
+            print(f"{self.label} falling back to polling")
+
+        while self.is_running:
+            # A GPIO read is a register access, cheap enough for the event loop
+            await invoke_callback(callback, self.get_sensor_data())
+            await asyncio.sleep(interval)
+
+    def stop_monitoring(self):
+        """Stop the monitoring loop."""
+        self.is_running = False
+        self._stop_event.set()
+        self._edge_callback = None
+        if self._scheduler is not None:
+            self._scheduler.remove(self.name)
+            self._scheduler = None
+
+    def cleanup(self):
+        """Clean up GPIO resources."""
+        GPIO.cleanup(self.pin)
@@ -0,0 +1,149 @@
+import time
+import numpy as np
+from typing import Optional
+
+# Upper bound on buckets per response; coarser steps are used for long ranges
+MAX_POINTS = 1000
+DEFAULT_POINTS = 300
+DEFAULT_RANGE = 24 * 3600
+
+
+def downsample(timestamps: np.ndarray, values: np.ndarray, start: float, step: float):
+    """
+    Aggregate a sorted series into fixed-width time buckets.
+
+    Args:
+        timestamps: Reading times in seconds, ascending
+        values: Reading values, same length as timestamps
+        start: Time the first bucket starts at
+        step: Bucket width in seconds
+
+    Returns:
+        list: One dict per non-empty bucket with 't' (bucket start), 'min', 'max',
+              'mean', 'last' and 'count'
+    """
+    return downsample_rollups({'ts': timestamps, 'min': values, 'max': values, 'sum': values,
+                               'count': np.ones(len(values)), 'last': values}, start, step)
+
+
+def downsample_rollups(rollups: dict, start: float, step: float):
+    """
+    Merge sorted rollup buckets into wider fixed-width time buckets.
+
+    Args:
+        rollups: Arrays 'ts', 'min', 'max', 'sum', 'count' and 'last' (as returned by
+                 TimeSeriesStore.query_rollups), ascending by 'ts'
+        start: Time the first output bucket starts at; earlier rollup buckets (the one
+               start falls in) are merged into the first output bucket
+        step: Output bucket width in seconds (no narrower than the rollups)
+
+    Returns:
+        list: Same bucket dicts as downsample()
+    """
+    timestamps = rollups['ts']
+    if len(timestamps) == 0:
+        return []
+
+    # The rollup bucket straddling start begins before it; count it in the first output bucket
+    bucket = np.maximum(np.floor((timestamps - start) / step), 0).astype(np.int64)
+    # Index of the first input bucket in every output bucket
+    starts = np.flatnonzero(np.r_[True, bucket[1:] != bucket[:-1]])
+    ends = np.r_[starts[1:], len(timestamps)]
+
+    counts = np.add.reduceat(rollups['count'], starts)
+    mins = np.minimum.reduceat(rollups['min'], starts)
+    maxs = np.maximum.reduceat(rollups['max'], starts)
+    means = np.add.reduceat(rollups['sum'], starts) / counts
+    lasts = rollups['last'][ends - 1]
+    times = start + bucket[starts] * step
+
+    return [
+        {'t': float(t), 'min': float(lo), 'max': float(hi), 'mean': round(float(mean), 4),
+         'last': float(last), 'count': int(count)}
+        for t, lo, hi, mean, last, count in zip(times, mins, maxs, means, lasts, counts)
+    ]
+
+
+def resolve_range(start: Optional[float], end: Optional[float], step: Optional[float]):
+    """
+    Fill in defaults for a history request and clamp the step.
+
+    Args:
+        start: Range start in epoch seconds (default: end minus 24 hours)
+        end: Range end in epoch seconds (default: now)
+        step: Requested bucket width in seconds (default: about DEFAULT_POINTS buckets)
+
+    Returns:
+        tuple: (start, end, step), with step widened so no more than MAX_POINTS
+               buckets are returned
+
+    Raises:
+        ValueError: If the range is empty or the step isn't positive
+    """
+    end = time.time() if end is None else end
+    start = end - DEFAULT_RANGE if start is None else start
+    if end <= start:
+        raise ValueError("'to' must be after 'from'")
+    if step is not None and step <= 0:
+        raise ValueError("'step' must be positive")
+
+    span = end - start
+    if step is None:
+        step = span / DEFAULT_POINTS
+    return start, end, max(step, span / MAX_POINTS)
+
+
+def select_resolution(resolutions, step: float) -> Optional[int]:
+    """
+    Pick the coarsest rollup resolution that still fits inside one bucket.
+
+    Args:
+        resolutions: Available rollup widths in seconds
+        step: Requested bucket width in seconds
+
+    Returns:
+        int: Rollup resolution to read, or None to read raw readings
+    """
+    usable = [resolution for resolution in resolutions if resolution <= step]
+    return max(usable) if usable else None
+
+
+def query_history(store, sensor: str, start: Optional[float] = None,
+                  end: Optional[float] = None, step: Optional[float] = None):
+    """
+    Downsampled history for one sensor.
+
+    Reads from the coarsest rollup tier no wider than the step (1m/1h/1d), falling
+    back to raw readings for steps under a minute. A 30-day chart therefore reads
+    about 720 hourly rows instead of 2.6 million readings.
+
+    Args:
+        store: TimeSeriesStore holding the readings
+        sensor: Sensor name
+        start: Range start in epoch seconds
+        end: Range end in epoch seconds
+        step: Bucket width in seconds
+
+    Returns:
+        dict: {'sensor', 'from', 'to', 'step', 'resolution' (rollup width used,
+              None for raw readings), 'buckets': [...]}
+
+    Raises:
+        ValueError: If the range or step is invalid
+    """
+    start, end, step = resolve_range(start, end, step)
+    resolution = select_resolution(store.rollups.resolutions, step)
+    if resolution is None:
+        timestamps, values = store.query(sensor, start, end)
+        buckets = downsample(timestamps, values, start, step)
+    else:
+        buckets = downsample_rollups(store.query_rollups(sensor, resolution, start, end), start, step)
+
+    return {
+        'sensor': sensor,
+        'from': start,
+        'to': end,
+        'step': step,
+        'resolution': resolution,
+        'buckets': buckets
+    }
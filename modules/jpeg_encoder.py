@@ -0,0 +1,137 @@
+import logging
+import os
+import cv2
+import numpy as np
+from typing import Optional
+
+# libjpeg-turbo binding is optional; fall back to OpenCV when it's missing
+try:
+    from turbojpeg import TurboJPEG, TJPF_BGR
+except ImportError:
+    TurboJPEG = None
+
+
+class FrameEncoder:
+    """
+    Base class for the frame encoders used by CameraModule.
+
+    Encoders run on a single thread (the camera encode stage), so scratch buffers such
+    as the downscaled frame are reused from one frame to the next instead of being
+    reallocated.
+    """
+
+    name = None
+    format = 'jpeg'
+    mime_type = 'image/jpeg'
+
+    def __init__(self):
+        self._resize_buffer = None
+
+    def resize(self, frame, scale: float):
+        """Downscale a frame into a reused buffer (returns the frame itself if scale >= 1)."""
+        if scale >= 1.0:
+            return frame
+        height, width = frame.shape[:2]
+        size = (max(1, int(width * scale)), max(1, int(height * scale)))
+        shape = (size[1], size[0]) + frame.shape[2:]
+        if self._resize_buffer is None or self._resize_buffer.shape != shape or self._resize_buffer.dtype != frame.dtype:
+            self._resize_buffer = np.empty(shape, dtype=frame.dtype)
+        return cv2.resize(frame, size, dst=self._resize_buffer, interpolation=cv2.INTER_AREA)
+
+    def encode(self, frame, quality: Optional[int] = None):
+        """
+        Encode a BGR frame.
+
+        Args:
+            frame: BGR frame as a NumPy array
+            quality: JPEG quality (0-100), or None for the backend default
+
+        Returns:
+            bytes, or a bytes-like NumPy buffer (convert with bytes(...) where bytes
+            are required)
+        """
+        raise NotImplementedError
+
+
+class OpenCVEncoder(FrameEncoder):
+    """JPEG encoding through cv2.imencode (always available)."""
+
+    name = 'opencv'
+
+    def encode(self, frame, quality: Optional[int] = None):
+        params = [cv2.IMWRITE_JPEG_QUALITY, quality] if quality is not None else []
+        ok, buffer = cv2.imencode('.jpg', frame, params)
+        if not ok:
+            raise RuntimeError("cv2.imencode failed")
+        # The NumPy buffer is bytes-like; only copy it where bytes are required
+        return buffer
+
+
+class TurboJpegEncoder(FrameEncoder):
+    """JPEG encoding through libjpeg-turbo via the PyTurboJPEG binding."""
+
+    name = 'turbojpeg'
+    default_quality = 95
+
+    def __init__(self):
+        super().__init__()
+        if TurboJPEG is None:
+            raise RuntimeError("PyTurboJPEG is not installed")
+        # Raises if the libturbojpeg shared library can't be found
+        self._jpeg = TurboJPEG()
+
+    def encode(self, frame, quality: Optional[int] = None):
+        return self._jpeg.encode(frame,
+                                 quality=quality if quality is not None else self.default_quality,
+                                 pixel_format=TJPF_BGR)
+
+
+class PassthroughEncoder(FrameEncoder):
+    """
+    Sends the raw pixel bytes without compression, for tests and benchmarks.
+
+    tobytes() is the one copy the frame needs anyway: the transport sends bytes.
+    """
+
+    name = 'passthrough'
+    format = 'raw_bgr'
+    mime_type = 'application/octet-stream'
+
+    def encode(self, frame, quality: Optional[int] = None):
+        return frame.tobytes()
+
+
+ENCODERS = {
+    OpenCVEncoder.name: OpenCVEncoder,
+    TurboJpegEncoder.name: TurboJpegEncoder,
+    PassthroughEncoder.name: PassthroughEncoder
+}
+
+
+def create_encoder(name: Optional[str] = None) -> FrameEncoder:
+    """
+    Create the frame encoder backend.
+
+    Args:
+        name: 'opencv', 'turbojpeg', 'passthrough' or 'auto' (default: CAMERA_ENCODER
+              environment variable, or 'auto'). 'auto' prefers libjpeg-turbo when the
+              binding and library are installed, and OpenCV otherwise.
+
+    Returns:
+        FrameEncoder: The encoder instance
+    """
+    name = name or os.environ.get('CAMERA_ENCODER') or 'auto'
+
+    if name == 'auto':
+        try:
+            encoder = TurboJpegEncoder()
+        except Exception as e:
+            logging.info(f"libjpeg-turbo not available ({e}), using OpenCV JPEG encoder")
+            encoder = OpenCVEncoder()
+    elif name in ENCODERS:
+        encoder = ENCODERS[name]()
+    else:
+        raise ValueError(f"Unknown frame encoder: {name}")
+
+    logging.info(f"Frame encoder: {encoder.name}")
+    return encoder
@@ -0,0 +1,68 @@
+import hashlib
+import threading
+import time
+from typing import Optional
+from modules.subscriptions import room_for
+
+
+class LastValueCache:
+    """
+    Thread-safe cache of the latest payload of every broadcast event.
+
+    New clients get it as one 'snapshot' message on connect (and HTTP clients from
+    /api/snapshot), so a dashboard can draw every sensor and the last camera frame
+    right away instead of waiting for each stream's next emission.
+
+    Every update stamps its event with the next number of a per-process sequence.
+    A snapshot's ETag is the per-process id plus a hash of the requested streams and
+    of every included event's stamp, so it only changes when one of those events
+    does (a client that only asked for rain keeps its cached snapshot while camera
+    frames stream in), and two stream selections never share one.
+    """
+
+    def __init__(self):
+        self._values = {}
+        self._versions = {}
+        self._sequence = 0
+        self._instance = format(int(time.time() * 1000), 'x')
+        self._lock = threading.Lock()
+
+    def update(self, event: str, data):
+        """
+        Record the latest payload of an event.
+
+        Args:
+            event: Event name (e.g. 'water_level_reading')
+            data: Payload as broadcast (not yet encoded for a wire format)
+        """
+        with self._lock:
+            self._sequence += 1
+            self._values[event] = data
+            self._versions[event] = (self._sequence, time.time())
+
+    def snapshot(self, streams: Optional[list] = None):
+        """
+        Current contents.
+
+        Args:
+            streams: Only include events of these streams (default: all)
+
+        Returns:
+            dict: {'etag': str, 'timestamp': float or None (last update of an included event),
+                   'events': {event: latest payload}}
+        """
+        with self._lock:
+            values = dict(self._values)
+            versions = dict(self._versions)
+
+        if streams is not None:
+            values = {event: data for event, data in values.items() if room_for(event) in streams}
+        included = sorted((event, versions[event][0]) for event in values)
+        selection = ','.join(sorted(streams)) if streams is not None else '*'
+        digest = hashlib.sha1(repr((selection, included)).encode()).hexdigest()[:16]
+        updated = max((versions[event][1] for event in values), default=None)
+        return {
+            'etag': f'{self._instance}-{digest}',
+            'timestamp': updated,
+            'events': values
+        }
@@ -0,0 +1,135 @@
+import threading
+from collections import deque
+from typing import Optional
+
+
+class RollingHistogram:
+    """
+    Latency histogram over the most recent N samples.
+
+    Bucket counts are kept incrementally (the evicted sample's bucket is decremented
+    as a new one arrives), so recording is O(log buckets); percentiles are computed
+    from the retained samples when a snapshot is taken.
+    """
+
+    BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000)
+
+    def __init__(self, window: int = 1000):
+        """
+        Args:
+            window: Number of most recent samples kept (default: 1000)
+        """
+        self.window = window
+        self.total = 0
+        self._samples = deque()
+        self._counts = [0] * (len(self.BUCKETS_MS) + 1)
+
+    def _bucket(self, ms: float) -> int:
+        low, high = 0, len(self.BUCKETS_MS)
+        while low < high:
+            mid = (low + high) // 2
+            if ms <= self.BUCKETS_MS[mid]:
+                high = mid
+            else:
+                low = mid + 1
+        return low
+
+    def record(self, seconds: float):
+        """Add a latency sample, evicting the oldest one once the window is full."""
+        ms = seconds * 1000.0
+        bucket = self._bucket(ms)
+        self._samples.append((ms, bucket))
+        self._counts[bucket] += 1
+        self.total += 1
+        if len(self._samples) > self.window:
+            _, evicted = self._samples.popleft()
+            self._counts[evicted] -= 1
+
+    def snapshot(self):
+        """
+        Summarize the current window.
+
+        Returns:
+            dict: count, total, mean/p50/p90/p99/max in milliseconds and the
+                  bucket counts keyed by upper bound ('le_<ms>', 'gt_<ms>')
+        """
+        values = sorted(ms for ms, _ in self._samples)
+        count = len(values)
+
+        def pct(p):
+            return round(values[min(count - 1, int(p / 100.0 * count))], 2) if count else None
+
+        buckets = {f"le_{bound}": self._counts[i] for i, bound in enumerate(self.BUCKETS_MS)}
+        buckets[f"gt_{self.BUCKETS_MS[-1]}"] = self._counts[-1]
+        return {
+            'count': count,
+            'total': self.total,
+            'mean_ms': round(sum(values) / count, 2) if count else None,
+            'p50_ms': pct(50),
+            'p90_ms': pct(90),
+            'p99_ms': pct(99),
+            'max_ms': round(values[-1], 2) if count else None,
+            'buckets': buckets
+        }
+
+
+class LatencyTracer:
+    """
+    Aggregates per-frame stage timestamps into rolling per-stage histograms.
+
+    Each camera frame carries a trace dict of time.monotonic() stamps taken as it
+    moves through the pipeline. A stage's latency is the difference between two
+    consecutive stamps; stamps that are missing (e.g. a reply from an older ML
+    server) simply leave that stage out for the frame.
+    """
+
+    # (stage, start stamp, end stamp)
+    STAGES = (
+        ('capture_wait', 'captured', 'encode_start'),   # waiting in the capture slot
+        ('encode', 'encode_start', 'encoded'),          # resize + JPEG encode
+        ('send_wait', 'encoded', 'sent'),               # waiting in the send slot / in-flight window
+        ('ml_round_trip', 'sent', 'received'),          # network + ML server inference
+        ('fanout', 'received', 'queued'),               # callback: encode once, queue for every client
+        ('pipeline', 'captured', 'queued')              # capture until queued (sending is per client)
+    )
+
+    def __init__(self, window: int = 1000):
+        """
+        Args:
+            window: Number of most recent frames kept per stage (default: 1000)
+        """
+        self.window = window
+        self._histograms = {}
+        self._lock = threading.Lock()
+
+    def record(self, stage: str, seconds: float):
+        """Record a single stage latency."""
+        with self._lock:
+            histogram = self._histograms.get(stage)
+            if histogram is None:
+                histogram = self._histograms[stage] = RollingHistogram(self.window)
+            histogram.record(seconds)
+
+    def record_trace(self, trace: dict, inference_time: Optional[float] = None):
+        """
+        Record every stage that can be computed from a frame's trace.
+
+        Args:
+            trace: Stage name -> monotonic timestamp
+            inference_time: Inference duration reported by the ML server, if any
+        """
+        for stage, start, end in self.STAGES:
+            if start in trace and end in trace:
+                self.record(stage, trace[end] - trace[start])
+        if inference_time is not None:
+            self.record('ml_inference', inference_time)
+
+    def snapshot(self):
+        """
+        Get the histogram summary of every stage seen so far.
+
+        Returns:
+            dict: {stage: RollingHistogram.snapshot()}
+        """
+        with self._lock:
+            return {stage: histogram.snapshot() for stage, histogram in self._histograms.items()}
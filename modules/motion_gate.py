@@ -0,0 +1,84 @@
+import time
+import cv2
+import numpy as np
+from typing import Optional
+
+
+class MotionGate:
+    """
+    Cheap change detector that decides whether a frame is worth sending for inference.
+
+    Each frame is shrunk to a small grayscale thumbnail and compared against a running
+    background average. The change score is the fraction of thumbnail pixels that
+    differ from the background by more than pixel_delta. Frames below the threshold
+    are held back, except for a keep-alive frame every keepalive_interval seconds.
+    """
+
+    def __init__(self,
+                 threshold: float = 0.02,
+                 keepalive_interval: float = 5.0,
+                 sample_size: tuple = (64, 48),
+                 pixel_delta: int = 25,
+                 learning_rate: float = 0.05):
+        """
+        Initialize the motion gate.
+
+        Args:
+            threshold: Fraction of changed pixels (0-1) needed to submit a frame (default: 0.02)
+            keepalive_interval: Maximum seconds between submitted frames on a static scene (default: 5.0)
+            sample_size: Thumbnail size (width, height) used for the comparison
+            pixel_delta: Minimum grayscale difference (0-255) for a pixel to count as changed
+            learning_rate: Weight of each new frame in the running background (0-1)
+        """
+        self.threshold = threshold
+        self.keepalive_interval = keepalive_interval
+        self.sample_size = sample_size
+        self.pixel_delta = pixel_delta
+        self.learning_rate = learning_rate
+
+        self.last_score = 0.0
+        self.frames_checked = 0
+        self.frames_gated = 0
+        self._background = None
+        self._last_submit = None
+
+    def change_score(self, frame) -> float:
+        """
+        Compare a frame against the running background and update the background.
+
+        Returns:
+            float: Fraction of thumbnail pixels that changed (1.0 for the first frame)
+        """
+        small = cv2.resize(frame, self.sample_size, interpolation=cv2.INTER_AREA)
+        if small.ndim == 3:
+            small = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+        gray = small.astype(np.float32)
+
+        if self._background is None:
+            self._background = gray
+            return 1.0
+
+        diff = cv2.absdiff(gray, self._background)
+        score = float(np.count_nonzero(diff > self.pixel_delta)) / diff.size
+        cv2.accumulateWeighted(gray, self._background, self.learning_rate)
+        return score
+
+    def should_submit(self, frame, now: Optional[float] = None) -> bool:
+        """
+        Decide whether a frame should be encoded and sent to the ML server.
+
+        Args:
+            frame: BGR or grayscale frame
+            now: Monotonic timestamp of the frame (default: time.monotonic())
+        """
+        now = time.monotonic() if now is None else now
+        self.frames_checked += 1
+        self.last_score = self.change_score(frame)
+
+        keepalive_due = self._last_submit is None or now - self._last_submit >= self.keepalive_interval
+        if self.last_score >= self.threshold or keepalive_due:
+            self._last_submit = now
+            return True
+
+        self.frames_gated += 1
+        return False
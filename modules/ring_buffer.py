@@ -0,0 +1,134 @@
+import threading
+import numpy as np
+from typing import Optional
+
+
+class RingBuffer:
+    """
+    Fixed-size, preallocated ring buffer of (timestamp, value) samples.
+
+    Appending writes into two float64 arrays in place, so recording a sample
+    allocates nothing. Windowed statistics are computed with vectorized NumPy calls
+    over at most capacity samples, which takes microseconds at the default size.
+    """
+
+    def __init__(self, capacity: int = 3600):
+        """
+        Initialize the buffer.
+
+        Args:
+            capacity: Number of most recent samples kept (default: 3600)
+        """
+        self.capacity = capacity
+        self._ts = np.zeros(capacity, dtype=np.float64)
+        self._values = np.zeros(capacity, dtype=np.float64)
+        self._next = 0
+        self._size = 0
+        # Samples ever appended; sample n (counting from 0) sits in slot n % capacity
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return self._size
+
+    def append(self, timestamp: float, value: float):
+        """
+        Record a sample, overwriting the oldest one once the buffer is full.
+
+        Args:
+            timestamp: Sample time in seconds since the epoch
+            value: Sample value
+        """
+        with self._lock:
+            self._ts[self._next] = timestamp
+            self._values[self._next] = value
+            self._next = (self._next + 1) % self.capacity
+            self.count += 1
+            if self._size < self.capacity:
+                self._size += 1
+
+    def sample(self, n: int):
+        """
+        Sample number n, counting every sample ever appended.
+
+        Returns:
+            tuple: (timestamp, value)
+
+        Raises:
+            IndexError: If the sample was overwritten or not appended yet
+        """
+        with self._lock:
+            if not self.count - self._size <= n < self.count:
+                raise IndexError(n)
+            slot = n % self.capacity
+            return float(self._ts[slot]), float(self._values[slot])
+
+    def window(self, seconds: Optional[float] = None):
+        """
+        Samples from the last seconds (measured back from the newest sample), oldest first.
+
+        Args:
+            seconds: Window length, None for everything in the buffer
+
+        Returns:
+            tuple: (timestamps, values) NumPy arrays (copies)
+        """
+        with self._lock:
+            if self._size < self.capacity:
+                ts = self._ts[:self._size].copy()
+                values = self._values[:self._size].copy()
+            else:
+                ts = np.roll(self._ts, -self._next)
+                values = np.roll(self._values, -self._next)
+
+        if seconds is not None and len(ts):
+            first = np.searchsorted(ts, ts[-1] - seconds, side='left')
+            ts, values = ts[first:], values[first:]
+        return ts, values
+
+    def stats(self, seconds: Optional[float] = None, percentiles=(50, 90, 99)):
+        """
+        Summary statistics over a window.
+
+        Args:
+            seconds: Window length, None for everything in the buffer
+            percentiles: Percentiles to report
+
+        Returns:
+            dict: count, first/last timestamp, mean, min, max, last value, slope
+                  (least-squares, value units per second) and 'pXX' for each percentile.
+                  Only 'count' is present for an empty window.
+        """
+        ts, values = self.window(seconds)
+        if not len(values):
+            return {'count': 0}
+
+        stats = {
+            'count': int(len(values)),
+            'first_ts': float(ts[0]),
+            'last_ts': float(ts[-1]),
+            'mean': float(values.mean()),
+            'min': float(values.min()),
+            'max': float(values.max()),
+            'last': float(values[-1]),
+            'slope': slope(ts, values)
+        }
+        for p, value in zip(percentiles, np.percentile(values, percentiles)):
+            stats[f'p{p}'] = float(value)
+        return stats
+
+
+def slope(ts: np.ndarray, values: np.ndarray) -> Optional[float]:
+    """
+    Least-squares slope of values over time.
+
+    Returns:
+        float: Change per second, or None with fewer than two distinct timestamps
+    """
+    if len(ts) < 2:
+        return None
+    t = ts - ts.mean()
+    denominator = float(np.dot(t, t))
+    if denominator == 0.0:
+        return None
+    return float(np.dot(t, values - values.mean()) / denominator)
@@ -0,0 +1,101 @@
+import threading
+from typing import Optional
+
+# (bucket width in seconds, retention in days or None to keep forever)
+DEFAULT_TIERS = (
+    (60, 365),
+    (3600, 5 * 365),
+    (86400, None)
+)
+
+
+class RollupEngine:
+    """
+    Incrementally aggregates readings into fixed buckets at several resolutions.
+
+    Every reading updates the running min/max/sum/count/last of the open bucket for
+    each resolution, so a reading costs a few comparisons per tier and nothing is
+    re-scanned. When a reading lands in a later bucket, the open one is closed and
+    handed back to the caller for storage. Closed buckets are merged into whatever
+    is already stored for that bucket (see TimeSeriesStore), so a bucket that was
+    interrupted by a restart just continues where it left off.
+    """
+
+    def __init__(self, tiers=DEFAULT_TIERS):
+        """
+        Initialize the engine.
+
+        Args:
+            tiers: Sequence of (resolution in seconds, retention in days or None)
+        """
+        self.tiers = tuple(tiers)
+        self.resolutions = tuple(resolution for resolution, _ in self.tiers)
+        self._open = {}
+        self._lock = threading.Lock()
+
+    def add(self, sensor: str, ts_ms: int, value: float):
+        """
+        Fold a reading into the open buckets of every resolution.
+
+        Args:
+            sensor: Sensor name
+            ts_ms: Reading time in milliseconds since the epoch
+            value: Reading value
+
+        Returns:
+            list: Buckets closed by this reading, as
+                  (sensor, resolution, bucket_ts_ms, min, max, sum, count, last, last_ts_ms)
+        """
+        closed = []
+        with self._lock:
+            for resolution in self.resolutions:
+                width = resolution * 1000
+                bucket_ts = ts_ms - ts_ms % width
+                key = (sensor, resolution)
+                bucket = self._open.get(key)
+
+                if bucket is not None and bucket[0] != bucket_ts:
+                    if bucket_ts < bucket[0]:
+                        # Late reading for an already closed bucket: store it on its own
+                        # and let the upsert merge it
+                        closed.append((sensor, resolution, bucket_ts, value, value, value, 1, value, ts_ms))
+                        continue
+                    closed.append((sensor, resolution, *bucket))
+                    bucket = None
+
+                if bucket is None:
+                    self._open[key] = [bucket_ts, value, value, value, 1, value, ts_ms]
+                    continue
+
+                if value < bucket[1]:
+                    bucket[1] = value
+                if value > bucket[2]:
+                    bucket[2] = value
+                bucket[3] += value
+                bucket[4] += 1
+                if ts_ms >= bucket[6]:
+                    bucket[5] = value
+                    bucket[6] = ts_ms
+        return closed
+
+    def open_buckets(self, sensor: Optional[str] = None, resolution: Optional[int] = None):
+        """
+        Snapshot of the buckets still being filled.
+
+        Args:
+            sensor: Only this sensor's buckets (default: all)
+            resolution: Only this resolution (default: all)
+
+        Returns:
+            list: Buckets in the same tuple layout as add() returns
+        """
+        with self._lock:
+            return [(name, res, *bucket) for (name, res), bucket in self._open.items()
+                    if (sensor is None or name == sensor) and (resolution is None or res == resolution)]
+
+    def drain(self):
+        """Close every open bucket (e.g. on shutdown) and return them."""
+        with self._lock:
+            closed = [(name, res, *bucket) for (name, res), bucket in self._open.items()]
+            self._open.clear()
+        return closed
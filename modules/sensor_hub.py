@@ -0,0 +1,481 @@
+"""
+Runtime-independent core of the sensor server.
+
+main.py (Flask-SocketIO on threads) and main_async.py (python-socketio AsyncServer
+on aiohttp) share everything here: the sensors and their callbacks, emission
+policies, the time-series store, and the Socket.IO fan-out state (subscriptions,
+batching, wire formats, per-client queues, last values). The runtimes only attach
+their Socket.IO server, apply the room changes returned here, start the sensors
+their way and turn the (body, status) results of the route methods into responses.
+"""
+import os
+from engineio import packet as eio_packet
+from socketio import packet as sio_packet
+from modules.water_level_sensor import WaterLevelSensor
+from modules.rain_sensor_module import RainSensor
+from modules.smoke_sensor_module import SmokeSensor
+from modules.camera_module import CameraModule
+from modules.emission_policy import EmissionPolicy
+from modules.timeseries_store import TimeSeriesStore
+from modules.history import query_history
+from modules.subscriptions import STREAMS, parse_streams, room_for, client_option, is_enabled
+from modules.emission_batcher import SensorBatcher, BATCHED_STREAMS
+from modules.wire_format import ClientFormats, parse_format, format_room, base_room, encode
+from modules.client_queues import ClientQueueManager
+from modules.last_value_cache import LastValueCache
+
+NAMESPACE = '/'
+
+# Polling intervals in seconds. Rain and smoke are interrupt-driven and only polled
+# if GPIO edge detection is unavailable; the water level interval only applies to
+# the threaded runtime's scheduler.
+SENSOR_INTERVALS = {
+    'water_level': float(os.environ.get('WATER_LEVEL_POLL_INTERVAL', 0.1)),
+    'rain': float(os.environ.get('RAIN_POLL_INTERVAL', 1.0)),
+    'smoke': float(os.environ.get('SMOKE_POLL_INTERVAL', 1.0))
+}
+
+# Seconds between checks for due heartbeats of the edge-triggered sensors
+HEARTBEAT_CHECK_INTERVAL = 1.0
+
+
+def float_param(params, key: str):
+    """
+    Optional float query parameter.
+
+    Args:
+        params: Mapping of query parameters
+        key: Parameter name
+
+    Returns:
+        float, or None if the parameter is missing or empty
+
+    Raises:
+        ValueError: If the value isn't a number
+    """
+    value = params.get(key)
+    if value in (None, ''):
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        raise ValueError(f"'{key}' must be a number")
+
+
+class SensorHub:
+    """
+    Sensors, sensor callbacks and Socket.IO fan-out shared by both runtimes.
+
+    Every event goes to the room of its stream (see modules.subscriptions), encoded
+    into Socket.IO packets once per wire format in use and handed to each
+    recipient's bounded send queue; the runtime's dispatcher writes the queued
+    packets to each client's Engine.IO socket. Batching
+    clients get sensor readings in one sensor_batch message per window instead, and
+    new clients get the last value of every stream as a snapshot.
+    """
+
+    def __init__(self):
+        # Clients connecting with batch=true get sensor readings as one 'sensor_batch'
+        # message per window instead of one event per reading; SENSOR_BATCH_WINDOW=0
+        # turns this off
+        self.batch_window = float(os.environ.get('SENSOR_BATCH_WINDOW', 0.1))
+        self.sensor_batcher = SensorBatcher(window=self.batch_window)
+
+        # Wire format per client: JSON by default, MessagePack for clients connecting
+        # with format=msgpack (see modules.wire_format)
+        self.client_formats = ClientFormats()
+
+        # Bounded send queue per client: a slow client loses stale camera frames (never
+        # alerts) instead of delaying or bloating fan-out (see modules.client_queues)
+        self.client_queues = ClientQueueManager(max_depth=int(os.environ.get('CLIENT_QUEUE_DEPTH', 32)))
+
+        # Latest payload of every non-alert event, sent to new clients as one 'snapshot'
+        # message and served from /api/snapshot
+        self.last_values = LastValueCache()
+
+        # Per-sensor emission policies: broadcast on change, on moves larger than the
+        # deadband, and at least every heartbeat seconds. Suppressed readings are counted
+        # in the next emitted reading (seq / suppressed / suppressed_samples).
+        self.emission_policies = {
+            'water_level': EmissionPolicy(deadband=float(os.environ.get('WATER_LEVEL_DEADBAND', 5)),
+                                          heartbeat=30.0, change_keys=('high_water_level',)),
+            'rain': EmissionPolicy(heartbeat=30.0, change_keys=('rain_detected',)),
+            'smoke': EmissionPolicy(heartbeat=30.0, change_keys=('smoke_detected',))
+        }
+
+        # Every reading is stored locally (before emission filtering) and group-committed
+        # by a background writer thread, so callbacks never wait on the SD card
+        self.timeseries_store = TimeSeriesStore(os.environ.get('SENSOR_DB_PATH', 'data/sensors.db'))
+        # Number of the next water level sample (see RingBuffer.sample) not yet stored
+        self._next_water_sample = 0
+
+        # Initialize sensors with callbacks
+        self.water_sensor = WaterLevelSensor(callback=self.water_level_callback)
+        self.rain_sensor = RainSensor()
+        self.smoke_sensor = SmokeSensor()
+        self.camera = CameraModule(
+            ml_server_url=os.environ.get('ML_SERVER_URL', 'http://localhost:5001'),
+            capture_interval=0.5,                   # Adjust based on your needs
+            resolution=(640, 480),                  # Adjust based on your needs
+            motion_threshold=0.02,                  # Only send frames where ~2% of the scene changed
+            keepalive_interval=5.0,                 # ...but still send one every 5s on a static scene
+            latency_target=0.5                      # Lower JPEG quality/resolution if round trips exceed 500ms
+        )
+
+        # Sensors by API name, each holding its recent readings in a ring buffer (sensor.recent)
+        self.sensors = {
+            'water_level': self.water_sensor,
+            'rain': self.rain_sensor,
+            'smoke': self.smoke_sensor
+        }
+
+        self.server = None
+
+    def attach(self, server):
+        """
+        Set the Socket.IO server events are sent through.
+
+        Args:
+            server: python-socketio Server or AsyncServer
+        """
+        self.server = server
+
+    # Fan-out
+
+    def room_members(self, room: str) -> list:
+        """Session ids of the clients in a room."""
+        try:
+            return [sid for sid, _ in self.server.manager.get_participants(NAMESPACE, room)]
+        except KeyError:
+            return []
+
+    def transport_depth(self, sid: str) -> int:
+        """Packets waiting in a client's Engine.IO send queue."""
+        try:
+            eio_sid = self.server.manager.eio_sid_from_sid(sid, NAMESPACE)
+            return self.server.eio.sockets[eio_sid].queue.qsize()
+        except (KeyError, AttributeError):
+            return 0
+
+    def eio_sid(self, sid: str):
+        """Engine.IO session id of a client, None once it's gone."""
+        try:
+            return self.server.manager.eio_sid_from_sid(sid, NAMESPACE)
+        except KeyError:
+            return None
+
+    def encode_event(self, event: str, payload) -> list:
+        """
+        Encode an event into the Engine.IO packets sent to every recipient.
+
+        Socket.IO's own room emit encodes per recipient when sending to one sid at a
+        time; encoding here lets the client queues hand the same packets to every
+        client's transport. A bytes payload becomes a binary attachment, i.e. two packets.
+        """
+        pkt = self.server.packet_class(sio_packet.EVENT, namespace=NAMESPACE, data=[event, payload])
+        encoded = pkt.encode()
+        if not isinstance(encoded, list):
+            encoded = [encoded]
+        return [eio_packet.Packet(eio_packet.MESSAGE, part) for part in encoded]
+
+    def send_to_room(self, event: str, payload, room: str):
+        """Encode an event once and queue it for every client in a room (skipped if it's empty)."""
+        members = self.room_members(room)
+        if members:
+            self.client_queues.put(members, event, self.encode_event(event, payload))
+
+    def broadcast(self, event: str, data):
+        """
+        Send an event to the clients subscribed to its stream (see modules.subscriptions).
+
+        The payload is serialized once per wire format in use (format rooms) and
+        encoded once into Socket.IO packets per format, which every recipient's send
+        queue then shares. Sensor readings are also collected for batching clients,
+        and every non-alert event updates the last-value cache.
+        """
+        stream = room_for(event)
+        if stream != 'alerts':
+            self.last_values.update(event, data)
+        for fmt in self.client_formats.active():
+            self.send_to_room(event, encode(data, fmt), format_room(stream, fmt))
+        if stream in BATCHED_STREAMS:
+            self.sensor_batcher.add(event, data)
+
+    def send_batch(self, room: str, fmt: str, payload: dict):
+        """Queue one sensor_batch message for a batch combination room."""
+        self.send_to_room('sensor_batch', encode(payload, fmt), room)
+
+    # Sensor callbacks
+
+    def camera_callback(self, data):
+        self.broadcast('camera_data', data)
+        # If the processed frame contains detection data
+        if 'detections' in data.get('frame', {}):
+            self.broadcast('camera_alert', {
+                'message': f"Object detected in camera view",
+                'detections': data['frame']['detections']
+            })
+
+    def water_level_callback(self, data):
+        # Store every sample drained since the last callback, each at its spread timestamp
+        # (see WaterLevelSensor._collect_samples), not just the newest one
+        recent = self.water_sensor.recent
+        end = recent.count
+        for n in range(max(self._next_water_sample, end - len(recent)), end):
+            self.timeseries_store.append('water_level', *recent.sample(n))
+        self._next_water_sample = end
+        # Rate-of-rise forecast, at most every few seconds or when the warning changes
+        forecast = self.water_sensor.forecast.poll()
+        if forecast is not None:
+            self.broadcast('water_level_forecast', forecast)
+            if forecast['warning'] and forecast['warning_changed']:
+                self.broadcast('water_level_alert', {
+                    'message': f"WATER LEVEL RISING: threshold expected in {forecast['time_to_threshold'] / 60:.0f} min",
+                    'forecast': forecast
+                })
+        data = self.emission_policies['water_level'].filter(data)
+        if data is None:
+            return
+        self.broadcast('water_level_reading', data)
+        # Send alert if water level is high
+        if data.get('high_water_level'):
+            self.broadcast('water_level_alert', {
+                'message': f"HIGH WATER LEVEL DETECTED: {data['value']}"
+            })
+
+    def rain_sensor_callback(self, data):
+        self.timeseries_store.append('rain', data['timestamp'], data['value'])
+        data = self.emission_policies['rain'].filter(data)
+        if data is None:
+            return
+        self.broadcast('rain_sensor_reading', data)
+        # Send alert if rain is detected
+        if data.get('rain_detected'):
+            self.broadcast('rain_alert', {
+                'message': f"RAINFALL DETECTED: {data['value']}"
+            })
+
+    def smoke_sensor_callback(self, data):
+        self.timeseries_store.append('smoke', data['timestamp'], data['value'])
+        data = self.emission_policies['smoke'].filter(data)
+        if data is None:
+            return
+        self.broadcast('smoke_sensor_reading', data)
+        # Send alert if smoke is detected
+        if data.get('smoke_detected'):
+            self.broadcast('smoke_alert', {
+                'message': f"SMOKE/GAS DETECTED: {data['value']}"
+            })
+
+    def send_heartbeats(self):
+        """
+        Re-read the edge-triggered sensors whose heartbeat is due.
+
+        In edge mode rain and smoke only report state changes, so without this a
+        steady state would never reach clients again. The reading goes through the
+        usual callback and emission policy. Call every HEARTBEAT_CHECK_INTERVAL seconds.
+        """
+        for name in ('rain', 'smoke'):
+            sensor = self.sensors[name]
+            if sensor.edge_triggered and self.emission_policies[name].heartbeat_due():
+                sensor.read_now()
+
+    # Socket.IO clients
+
+    def connect_client(self, sid: str, auth, query):
+        """
+        Register a new client from its connection options.
+
+        Options come from the auth payload or the connection URL query: streams
+        (default: all), batch=true for sensor_batch messages, format=msgpack for
+        MessagePack payloads.
+
+        Args:
+            sid: Socket.IO session id
+            auth: Auth payload sent by the client
+            query: Mapping of URL query parameters
+
+        Returns:
+            tuple: (connection_status payload, rooms to join)
+
+        Raises:
+            ValueError: If a stream or the format is unknown
+        """
+        streams = parse_streams(client_option(auth, query, 'streams'))
+        fmt = parse_format(client_option(auth, query, 'format'))
+        self.client_formats.set(sid, fmt)
+        self.client_queues.register(sid)
+        batch = self.batch_window > 0 and is_enabled(client_option(auth, query, 'batch', False))
+        if batch:
+            self.sensor_batcher.set_client(sid, (), fmt)
+        _, join = self.join_streams(sid, streams)
+        print(f'Client connected ({", ".join(streams)}; {fmt}{", batched" if batch else ""})')
+        return {'status': 'connected', 'streams': streams, 'batch': batch, 'format': fmt}, join
+
+    def queue_snapshot(self, sid: str, streams):
+        """Queue the last value of each of a client's streams (call after it joined its rooms)."""
+        payload = encode(self.last_values.snapshot(streams), self.client_formats.get(sid))
+        self.client_queues.put([sid], 'snapshot', self.encode_event('snapshot', payload))
+
+    def join_streams(self, sid: str, streams):
+        """
+        Subscribe a client to streams; batching clients get batched streams through their batch room.
+
+        Returns:
+            tuple: (rooms to leave, rooms to join)
+        """
+        leave, join = [], []
+        if self.sensor_batcher.is_batched(sid):
+            batched = self.sensor_batcher.client_streams(sid).union(streams)
+            self._move_batch_room(sid, batched, leave, join)
+            streams = [stream for stream in streams if stream not in BATCHED_STREAMS]
+        fmt = self.client_formats.get(sid)
+        join.extend(format_room(stream, fmt) for stream in streams)
+        return leave, join
+
+    def leave_streams(self, sid: str, streams):
+        """
+        Unsubscribe a client from streams (or drop them from its batches).
+
+        Returns:
+            tuple: (rooms to leave, rooms to join)
+        """
+        leave, join = [], []
+        if self.sensor_batcher.is_batched(sid):
+            batched = self.sensor_batcher.client_streams(sid).difference(streams)
+            self._move_batch_room(sid, batched, leave, join)
+            streams = [stream for stream in streams if stream not in BATCHED_STREAMS]
+        fmt = self.client_formats.get(sid)
+        leave.extend(format_room(stream, fmt) for stream in streams)
+        return leave, join
+
+    def _move_batch_room(self, sid, batched, leave, join):
+        old_room, new_room = self.sensor_batcher.set_client(sid, batched)
+        if old_room:
+            leave.append(old_room)
+        if new_room:
+            join.append(new_room)
+
+    def subscribe(self, sid: str, data):
+        """
+        Handle a subscribe event; data is a stream list, comma-separated string or {'streams': [...]}.
+
+        Returns:
+            tuple: (rooms to leave, rooms to join)
+
+        Raises:
+            ValueError: If a stream is unknown
+        """
+        return self.join_streams(sid, parse_streams(data, default=()))
+
+    def unsubscribe(self, sid: str, data):
+        """Handle an unsubscribe event; same data format and result as subscribe."""
+        return self.leave_streams(sid, parse_streams(data, default=()))
+
+    def subscription_ack(self, sid: str, error=None) -> dict:
+        """Ack for subscribe/unsubscribe: the client's streams, and the error if there was one."""
+        joined = {base_room(room) for room in self.server.rooms(sid, NAMESPACE)} | \
+            self.sensor_batcher.client_streams(sid)
+        ack = {'streams': [stream for stream in STREAMS if stream in joined]}
+        if error is not None:
+            ack = {'error': str(error), **ack}
+        return ack
+
+    def disconnect_client(self, sid: str):
+        """Forget a disconnected client."""
+        self.sensor_batcher.remove_client(sid)
+        self.client_formats.remove(sid)
+        self.client_queues.unregister(sid)
+        print('Client disconnected')
+
+    # HTTP routes, as (body, status) or (body, status, headers)
+
+    def status(self):
+        return {
+            "status": "online",
+            "sensors": {
+                "water_level": self.water_sensor.is_running,
+                "rain": self.rain_sensor.is_running,
+                "smoke": self.smoke_sensor.is_running,
+                "camera": self.camera.is_running
+            },
+            "emission": {name: policy.get_stats() for name, policy in self.emission_policies.items()},
+            "camera_pipeline": self.camera.get_pipeline_stats(),
+            "storage": self.timeseries_store.get_stats(),
+            "batching": self.sensor_batcher.get_stats(),
+            "clients_by_format": self.client_formats.get_stats(),
+            "clients": self.client_queues.get_stats()
+        }, 200
+
+    def snapshot(self, params, if_none_match: str = None):
+        """
+        Latest value of every stream (the same payload as the Socket.IO 'snapshot' event).
+        Query params: streams (comma-separated, default: all). A matching If-None-Match
+        gets a 304 without a body.
+        """
+        try:
+            streams = parse_streams(params.get('streams'))
+        except ValueError as e:
+            return {"error": str(e)}, 400
+        cached = self.last_values.snapshot(streams)
+        etag = f'"{cached["etag"]}"'
+        headers = {'ETag': etag, 'Cache-Control': 'no-cache'}
+        if if_none_match:
+            tags = [tag.strip() for tag in if_none_match.split(',')]
+            if etag in tags or f'W/{etag}' in tags or '*' in tags:
+                return None, 304, headers
+        return cached, 200, headers
+
+    def latency_metrics(self):
+        """Rolling per-stage latency histograms for camera frames (capture until queued for the clients)."""
+        return self.camera.tracer.snapshot(), 200
+
+    def sensor_history(self, name: str, params):
+        """
+        Downsampled sensor history: min/max/mean/last per bucket.
+        Query params (epoch seconds): from, to (default: the last 24 hours), step (bucket width).
+        Reads SQLite, so the async runtime runs it in an executor.
+        """
+        if name not in self.emission_policies:
+            return {"error": f"Unknown sensor: {name}"}, 404
+        try:
+            start, end, step = (float_param(params, key) for key in ('from', 'to', 'step'))
+            return query_history(self.timeseries_store, name, start=start, end=end, step=step), 200
+        except ValueError as e:
+            return {"error": str(e)}, 400
+
+    def sensor_recent(self, name: str, params):
+        """
+        Recent in-memory readings and windowed stats (mean, min/max, slope, percentiles).
+        Query params: window (seconds, default: 300), samples (0 to leave out the raw samples).
+        """
+        sensor = self.sensors.get(name)
+        if sensor is None:
+            return {"error": f"Unknown sensor: {name}"}, 404
+        try:
+            window = float_param(params, 'window')
+        except ValueError as e:
+            return {"error": str(e)}, 400
+        window = 300.0 if window is None else window
+        result = {"sensor": name, "window": window, "stats": sensor.recent.stats(window)}
+        if params.get('samples', '1') != '0':
+            timestamps, values = sensor.recent.window(window)
+            result["samples"] = list(zip(timestamps.tolist(), values.tolist()))
+        return result, 200
+
+    # Lifecycle
+
+    def stop_sensors(self):
+        """Stop every sensor's monitoring."""
+        self.water_sensor.stop_monitoring()
+        self.rain_sensor.stop_monitoring()
+        self.smoke_sensor.stop_monitoring()
+        self.camera.stop_monitoring()
+
+    def cleanup(self):
+        """Release sensor resources and commit the readings still queued."""
+        self.water_sensor.cleanup()
+        self.rain_sensor.cleanup()
+        self.smoke_sensor.cleanup()
+        self.camera.cleanup()
+        self.timeseries_store.stop()
@@ -0,0 +1,159 @@
+import heapq
+import itertools
+import logging
+import threading
+import time
+from typing import Callable
+
+
+class SensorScheduler:
+    """
+    Runs periodic sensor reads for every sensor on a single worker thread.
+
+    Tasks sit in a heap keyed by their next deadline. The worker sleeps until the
+    earliest deadline, runs that task, and schedules it again one interval later on
+    the monotonic clock. Deadlines a slow task made us miss are skipped (and counted
+    as overruns) rather than run back to back. Tasks must not block: a read that
+    waits on I/O delays every other sensor.
+    """
+
+    def __init__(self):
+        self._heap = []
+        self._tasks = {}
+        self._sequence = itertools.count()
+        self._cond = threading.Condition()
+        self._thread = None
+        self._running = False
+
+    def add(self, name: str, fn: Callable, interval: float):
+        """
+        Schedule fn to run every interval seconds, starting right away.
+
+        Args:
+            name: Unique task name (replaces an existing task with the same name)
+            fn: Callable taking no arguments
+            interval: Seconds between runs
+
+        Raises:
+            ValueError: If interval is not positive
+        """
+        if interval <= 0:
+            raise ValueError(f"Invalid interval for task {name}: {interval}")
+        with self._cond:
+            self._tasks[name] = {
+                'fn': fn,
+                'interval': interval,
+                'generation': next(self._sequence),
+                'runs': 0,
+                'errors': 0,
+                'overruns': 0,
+                'total_time': 0.0,
+                'max_time': 0.0,
+                'last_time': 0.0
+            }
+            self._push(name, time.monotonic())
+
+    def remove(self, name: str):
+        """Stop running a task (no-op if it isn't scheduled)."""
+        with self._cond:
+            self._tasks.pop(name, None)
+            self._cond.notify()
+
+    def _push(self, name: str, due: float):
+        """Queue a task's next run (call with _cond held)."""
+        task = self._tasks[name]
+        heapq.heappush(self._heap, (due, next(self._sequence), name, task['generation']))
+        self._cond.notify()
+
+    def start(self):
+        """Start the worker thread."""
+        with self._cond:
+            if self._running:
+                return
+            self._running = True
+        self._thread = threading.Thread(target=self._run, name='sensor-scheduler', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop the worker thread after the task in progress finishes."""
+        with self._cond:
+            self._running = False
+            self._cond.notify()
+        if self._thread and self._thread is not threading.current_thread():
+            self._thread.join(timeout=5)
+
+    def _next_task(self):
+        """Wait for the earliest due task; returns (name, due, task) or None when stopped."""
+        with self._cond:
+            while self._running:
+                if not self._heap:
+                    self._cond.wait()
+                    continue
+                due, _, name, generation = self._heap[0]
+                task = self._tasks.get(name)
+                if task is None or task['generation'] != generation:
+                    # Removed or replaced since it was queued
+                    heapq.heappop(self._heap)
+                    continue
+                delay = due - time.monotonic()
+                if delay > 0:
+                    self._cond.wait(delay)
+                    continue
+                heapq.heappop(self._heap)
+                return name, due, task
+        return None
+
+    def _run(self):
+        """Worker loop."""
+        while True:
+            entry = self._next_task()
+            if entry is None:
+                return
+            name, due, task = entry
+
+            started = time.monotonic()
+            try:
+                task['fn']()
+            except Exception as e:
+                task['errors'] += 1
+                logging.error(f"Error in scheduled sensor task '{name}': {e}")
+            finished = time.monotonic()
+
+            elapsed = finished - started
+            task['runs'] += 1
+            task['total_time'] += elapsed
+            task['last_time'] = elapsed
+            task['max_time'] = max(task['max_time'], elapsed)
+
+            with self._cond:
+                if self._tasks.get(name) is not task:
+                    continue
+                interval = task['interval']
+                next_due = due + interval
+                if next_due <= finished and interval > 0:
+                    missed = int((finished - next_due) // interval) + 1
+                    task['overruns'] += missed
+                    next_due += missed * interval
+                self._push(name, next_due)
+
+    def get_stats(self):
+        """
+        Get per-task timing stats.
+
+        Returns:
+            dict: {name: {'interval', 'runs', 'errors', 'overruns',
+                          'mean_ms', 'max_ms', 'last_ms'}}
+        """
+        with self._cond:
+            return {
+                name: {
+                    'interval': task['interval'],
+                    'runs': task['runs'],
+                    'errors': task['errors'],
+                    'overruns': task['overruns'],
+                    'mean_ms': round(task['total_time'] / task['runs'] * 1000, 3) if task['runs'] else None,
+                    'max_ms': round(task['max_time'] * 1000, 3),
+                    'last_ms': round(task['last_time'] * 1000, 3)
+                }
+                for name, task in self._tasks.items()
+            }
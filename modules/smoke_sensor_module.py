@@ -1,23 +1,28 @@
-import time
 import RPi.GPIO as GPIO
+from modules.gpio_edge import EdgeTriggeredSensor
 
-class SmokeSensor:
+class SmokeSensor(EdgeTriggeredSensor):
     """
     Class to handle the MQ2 smoke/gas sensor connected to Raspberry Pi.
     Provides methods to initialize, read data without Socket.IO dependency.
+    Edge-triggered and polled monitoring come from EdgeTriggeredSensor.
     """
     
-    def __init__(self, pin=11, threshold=300):
+    name = 'smoke'
+    label = 'Smoke sensor'
+    
+    def __init__(self, pin=11, threshold=300, history_size=3600):
         """
         Initialize the smoke sensor.
         
         Args:
             pin: GPIO pin number (default: 11 which is GPIO 0)
             threshold: Threshold value to detect smoke (default: 300)
+            history_size: Number of recent readings kept in memory in self.recent
+                          (default: 3600)
         """
-        self.pin = pin
+        super().__init__(pin, history_size)
         self.threshold = threshold
-        self.is_running = False
         
         # Setup GPIO with pull-down resistor to reduce noise
         GPIO.setmode(GPIO.BOARD)  # Use physical pin numbering
@@ -27,44 +32,34 @@ class SmokeSensor:
         """Read the current value from the smoke sensor."""
         return GPIO.input(self.pin)
     
+    def read_pin(self):
+        return self.read_sensor()
+    
     def is_smoke_detected(self):
         """Check if smoke is detected based on the threshold."""
         value = self.read_sensor()
         return value == GPIO.LOW  # MQ2 outputs LOW when gas detected
 
-    def start_monitoring(self, callback, interval=1.0):
+    def build_reading(self, reading, timestamp):
         """
-        Start monitoring the smoke sensor and send readings to callback.
+        Format a reading.
         
-        Args:
-            callback: Function to call with sensor data
-            interval: Time between readings in seconds (default: 1.0)
+        Returns:
+            dict: Data containing sensor readings and status
         """
-        self.is_running = True
-        
-        while self.is_running:
-            reading = self.read_sensor()
-            smoke_detected = self.is_smoke_detected()
-
-            # Debug prints
-            print(f"Smoke sensor reading: {reading}")
-            
-            # Prepare data to send to callback
-            data = {
-                'timestamp': time.time(),
-                'value': reading,
-                'smoke_detected': smoke_detected
-            }
-            
-            # Send data to callback function
-            callback(data)
+        # Derive from the same reading so value and flag can't disagree
+        smoke_detected = reading == GPIO.LOW
 
-            time.sleep(interval)
-    
-    def stop_monitoring(self):
-        """Stop the monitoring loop."""
-        self.is_running = False
-    
-    def cleanup(self):
-        """Clean up GPIO resources."""
-        GPIO.cleanup(self.pin)
+        # Debug prints
+        print(f"Smoke sensor reading: {reading}")
+        
+        # Prepare data to send to callback
+        self.recent.append(timestamp, reading)
+        
+        data = {
+            'timestamp': timestamp,
+            'value': reading,
+            'smoke_detected': smoke_detected
+        }
+        
+        return data
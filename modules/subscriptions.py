@@ -0,0 +1,79 @@
+"""
+Socket.IO stream subscriptions.
+
+Every event is broadcast to the room of the stream it belongs to, and clients join
+the rooms of the streams they want. Clients that don't ask for anything get every
+stream, which matches the old broadcast-to-everyone behaviour.
+"""
+
+STREAMS = ('camera', 'water_level', 'rain', 'smoke', 'alerts')
+
+# Stream (room) each emitted event belongs to
+EVENT_STREAMS = {
+    'camera_data': 'camera',
+    'camera_alert': 'alerts',
+    'water_level_reading': 'water_level',
+    'water_level_forecast': 'water_level',
+    'water_level_alert': 'alerts',
+    'rain_sensor_reading': 'rain',
+    'rain_alert': 'alerts',
+    'smoke_sensor_reading': 'smoke',
+    'smoke_alert': 'alerts'
+}
+
+
+def room_for(event: str) -> str:
+    """Room an event is broadcast to."""
+    return EVENT_STREAMS[event]
+
+
+def parse_streams(value, default=STREAMS) -> list:
+    """
+    Parse a client's stream selection.
+
+    Args:
+        value: None, a comma-separated string, a list of stream names, or a dict
+               with a 'streams' key holding either
+        default: Streams to use when value is None or empty
+
+    Returns:
+        list: Stream names, in STREAMS order
+
+    Raises:
+        ValueError: If a stream name is unknown
+    """
+    if isinstance(value, dict):
+        value = value.get('streams')
+    if not value:
+        return list(default)
+    if isinstance(value, str):
+        value = value.split(',')
+
+    requested = {str(name).strip() for name in value if str(name).strip()}
+    unknown = requested.difference(STREAMS)
+    if unknown:
+        raise ValueError(f"Unknown streams: {', '.join(sorted(unknown))}")
+    return [stream for stream in STREAMS if stream in requested]
+
+
+def client_option(auth, query, key: str, default=None):
+    """
+    Read a connection option from the Socket.IO auth payload, else the URL query.
+
+    Args:
+        auth: Auth payload sent by the client (only dicts carry options)
+        query: Mapping of URL query parameters
+        key: Option name
+        default: Value when the client didn't set the option
+
+    Returns:
+        The option value as sent (query values are strings)
+    """
+    if isinstance(auth, dict) and key in auth:
+        return auth[key]
+    return query.get(key, default)
+
+
+def is_enabled(value) -> bool:
+    """Interpret an option value such as True, 1, '1', 'true' or 'yes' as a flag."""
+    return str(value).strip().lower() in ('1', 'true', 'yes', 'on')
@@ -0,0 +1,361 @@
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import deque
+from typing import Optional
+import numpy as np
+from modules.rollups import RollupEngine, DEFAULT_TIERS
+
+
+class TimeSeriesStore:
+    """
+    Local SQLite time-series store for sensor readings.
+
+    Sampling loops only append to an in-memory queue; a background writer thread
+    group-commits everything queued in one transaction every flush_interval seconds
+    (or sooner once batch_size readings are waiting). Together with WAL mode and
+    synchronous=NORMAL this turns thousands of 1 Hz readings into a handful of
+    sequential SD card writes per minute.
+
+    Readings are stored as (sensor_id, ts in milliseconds, value) in a WITHOUT ROWID
+    table keyed on (sensor_id, ts), which keeps rows small and range scans per sensor
+    contiguous. Rows older than retention_days are pruned periodically.
+
+    Every reading also feeds a RollupEngine; closed 1m/1h/1d buckets are written to
+    the rollups table in the same group commit, each tier with its own retention, so
+    long-range history never has to scan raw readings.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS sensors (
+            id INTEGER PRIMARY KEY,
+            name TEXT NOT NULL UNIQUE
+        );
+        CREATE TABLE IF NOT EXISTS readings (
+            sensor_id INTEGER NOT NULL,
+            ts INTEGER NOT NULL,
+            value REAL NOT NULL,
+            PRIMARY KEY (sensor_id, ts)
+        ) WITHOUT ROWID;
+        CREATE TABLE IF NOT EXISTS rollups (
+            sensor_id INTEGER NOT NULL,
+            resolution INTEGER NOT NULL,
+            ts INTEGER NOT NULL,
+            min REAL NOT NULL,
+            max REAL NOT NULL,
+            sum REAL NOT NULL,
+            count INTEGER NOT NULL,
+            last REAL NOT NULL,
+            last_ts INTEGER NOT NULL,
+            PRIMARY KEY (sensor_id, resolution, ts)
+        ) WITHOUT ROWID;
+    """
+
+    # Merge a closed bucket into the stored one (if a restart split it in two)
+    UPSERT_ROLLUP = """
+        INSERT INTO rollups (sensor_id, resolution, ts, min, max, sum, count, last, last_ts)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT (sensor_id, resolution, ts) DO UPDATE SET
+            min = MIN(min, excluded.min),
+            max = MAX(max, excluded.max),
+            sum = sum + excluded.sum,
+            count = count + excluded.count,
+            last = CASE WHEN excluded.last_ts >= last_ts THEN excluded.last ELSE last END,
+            last_ts = MAX(last_ts, excluded.last_ts)
+    """
+
+    def __init__(self,
+                 path: str = 'data/sensors.db',
+                 flush_interval: float = 10.0,
+                 batch_size: int = 5000,
+                 max_pending: int = 200000,
+                 retention_days: Optional[float] = 180,
+                 rollup_tiers=DEFAULT_TIERS):
+        """
+        Initialize the store.
+
+        Args:
+            path: SQLite database file (parent directories are created)
+            flush_interval: Maximum seconds between group commits (default: 10)
+            batch_size: Commit early once this many readings are queued (default: 5000)
+            max_pending: Queue bound; the oldest readings are dropped if the disk can't
+                         keep up (default: 200000)
+            retention_days: Delete readings older than this, None to keep everything
+                            (default: 180)
+            rollup_tiers: (resolution seconds, retention days or None) per rollup tier
+                          (default: 1m for a year, 1h for five years, 1d forever)
+        """
+        self.path = path
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.retention_days = retention_days
+
+        self.written = 0
+        self.rollups_written = 0
+        self.dropped = 0
+        self._pending = deque(maxlen=max_pending)
+        self._flushing = []
+        self._pending_rollups = deque()
+        self._flushing_rollups = []
+        self.rollups = RollupEngine(rollup_tiers)
+        self._sensor_ids = {}
+        self._wake = threading.Event()
+        self._stop_event = threading.Event()
+        self._thread = None
+        self._last_prune = 0.0
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._conn = self._connect()
+        self._conn.executescript(self.SCHEMA)
+        for sensor_id, name in self._conn.execute("SELECT id, name FROM sensors"):
+            self._sensor_ids[name] = sensor_id
+
+    def _connect(self):
+        """Open a connection with the pragmas tuned for SD card storage."""
+        conn = sqlite3.connect(self.path, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        return conn
+
+    def append(self, sensor: str, timestamp: float, value):
+        """
+        Queue a reading for the next group commit. Never blocks on disk.
+
+        Args:
+            sensor: Sensor name (e.g. 'water_level')
+            timestamp: Reading time in seconds since the epoch
+            value: Numeric reading (bools are stored as 0/1)
+        """
+        if value is None:
+            return
+        ts_ms, value = int(timestamp * 1000), float(value)
+        if len(self._pending) == self._pending.maxlen:
+            self.dropped += 1
+        self._pending.append((sensor, ts_ms, value))
+        self._pending_rollups.extend(self.rollups.add(sensor, ts_ms, value))
+        if len(self._pending) >= self.batch_size:
+            self._wake.set()
+
+    def start(self):
+        """Start the background writer thread."""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._writer_loop, name='timeseries-writer', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop the writer thread and commit everything still queued."""
+        self._stop_event.set()
+        self._wake.set()
+        if self._thread:
+            self._thread.join(timeout=10)
+        # Partial buckets are merged with the rest of the bucket after a restart
+        self._pending_rollups.extend(self.rollups.drain())
+        self.flush()
+
+    def _writer_loop(self):
+        """Background writer: group-commit queued readings and prune old ones."""
+        while not self._stop_event.is_set():
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                self.flush()
+                self._prune_if_due()
+            except sqlite3.Error as e:
+                logging.error(f"Error writing sensor readings: {e}")
+
+    def _sensor_id(self, name: str) -> int:
+        """Look up (or register) a sensor's id (writer thread only)."""
+        sensor_id = self._sensor_ids.get(name)
+        if sensor_id is None:
+            self._conn.execute("INSERT OR IGNORE INTO sensors (name) VALUES (?)", (name,))
+            sensor_id = self._conn.execute("SELECT id FROM sensors WHERE name = ?", (name,)).fetchone()[0]
+            self._sensor_ids[name] = sensor_id
+        return sensor_id
+
+    @staticmethod
+    def _take(queue: deque) -> list:
+        """Pop everything currently in a queue."""
+        items = []
+        while queue:
+            try:
+                items.append(queue.popleft())
+            except IndexError:
+                break
+        return items
+
+    def flush(self):
+        """
+        Commit every queued reading and closed rollup bucket in a single transaction.
+
+        If the transaction fails, the batch goes back to the front of the queues for
+        the next attempt (the oldest readings are dropped if that overflows
+        max_pending) and the sqlite3.Error is re-raised.
+        """
+        batch = self._take(self._pending)
+        buckets = self._take(self._pending_rollups)
+        if not batch and not buckets:
+            return
+
+        # Keep the batch visible to queries until it is committed
+        self._flushing, self._flushing_rollups = batch, buckets
+        try:
+            with self._conn:
+                rows = [(self._sensor_id(sensor), ts, value) for sensor, ts, value in batch]
+                self._conn.executemany("INSERT OR REPLACE INTO readings (sensor_id, ts, value) VALUES (?, ?, ?)", rows)
+                self._conn.executemany(self.UPSERT_ROLLUP,
+                                       [(self._sensor_id(bucket[0]), *bucket[1:]) for bucket in buckets])
+        except sqlite3.Error:
+            self._requeue(batch, buckets)
+            raise
+        finally:
+            self._flushing, self._flushing_rollups = [], []
+        self.written += len(rows)
+        self.rollups_written += len(buckets)
+
+    def _requeue(self, batch: list, buckets: list):
+        """Put a batch whose transaction failed back in front of the queued readings."""
+        # Sensor ids registered in the rolled-back transaction are gone
+        self._sensor_ids.clear()
+        room = self._pending.maxlen - len(self._pending)
+        if len(batch) > room:
+            self.dropped += len(batch) - room
+            batch = batch[len(batch) - room:]
+        self._pending.extendleft(reversed(batch))
+        self._pending_rollups.extendleft(reversed(buckets))
+
+    def query(self, sensor: str, start: float, end: float):
+        """
+        Read one sensor's readings in [start, end), oldest first.
+
+        Uses its own short-lived connection, so it can run on any thread alongside the
+        writer (WAL readers don't block it). Readings still waiting for the next group
+        commit are included.
+
+        Args:
+            sensor: Sensor name
+            start: Range start in seconds since the epoch
+            end: Range end in seconds since the epoch
+
+        Returns:
+            tuple: (timestamps in seconds, values) as float64 NumPy arrays
+        """
+        start_ms, end_ms = int(start * 1000), int(end * 1000)
+        conn = sqlite3.connect(self.path)
+        try:
+            rows = conn.execute(
+                "SELECT r.ts, r.value FROM readings r JOIN sensors s ON s.id = r.sensor_id "
+                "WHERE s.name = ? AND r.ts >= ? AND r.ts < ? ORDER BY r.ts",
+                (sensor, start_ms, end_ms)).fetchall()
+        finally:
+            conn.close()
+
+        pending = [(ts, value) for name, ts, value in self._flushing + list(self._pending)
+                   if name == sensor and start_ms <= ts < end_ms]
+        if pending:
+            last_ts = rows[-1][0] if rows else None
+            rows.extend(row for row in pending if last_ts is None or row[0] > last_ts)
+
+        data = np.array(rows, dtype=np.float64).reshape(-1, 2)
+        return data[:, 0] / 1000.0, data[:, 1]
+
+    def query_rollups(self, sensor: str, resolution: int, start: float, end: float):
+        """
+        Read one sensor's rollup buckets of one resolution overlapping [start, end).
+
+        Buckets that are still open (or closed but not yet committed) are merged in,
+        so the most recent bucket is up to date.
+
+        Args:
+            sensor: Sensor name
+            resolution: Bucket width in seconds (one of rollups.resolutions)
+            start: Range start in seconds since the epoch
+            end: Range end in seconds since the epoch
+
+        Returns:
+            dict: float64 NumPy arrays 'ts' (bucket start, seconds), 'min', 'max',
+                  'sum', 'count' and 'last', oldest bucket first
+        """
+        width = resolution * 1000
+        start_ms = int(start * 1000)
+        start_ms -= start_ms % width
+        end_ms = int(end * 1000)
+
+        conn = sqlite3.connect(self.path)
+        try:
+            rows = conn.execute(
+                "SELECT r.ts, r.min, r.max, r.sum, r.count, r.last, r.last_ts FROM rollups r "
+                "JOIN sensors s ON s.id = r.sensor_id "
+                "WHERE s.name = ? AND r.resolution = ? AND r.ts >= ? AND r.ts < ? ORDER BY r.ts",
+                (sensor, resolution, start_ms, end_ms)).fetchall()
+        finally:
+            conn.close()
+
+        recent = self._flushing_rollups + list(self._pending_rollups) + self.rollups.open_buckets(sensor, resolution)
+        if recent:
+            merged = {row[0]: list(row) for row in rows}
+            for name, res, ts, lo, hi, total, count, last, last_ts in recent:
+                if name != sensor or res != resolution or not start_ms <= ts < end_ms:
+                    continue
+                row = merged.get(ts)
+                if row is None:
+                    merged[ts] = [ts, lo, hi, total, count, last, last_ts]
+                    continue
+                row[1], row[2] = min(row[1], lo), max(row[2], hi)
+                row[3] += total
+                row[4] += count
+                if last_ts >= row[6]:
+                    row[5], row[6] = last, last_ts
+            rows = [merged[ts] for ts in sorted(merged)]
+
+        data = np.array(rows, dtype=np.float64).reshape(-1, 7)
+        return {
+            'ts': data[:, 0] / 1000.0,
+            'min': data[:, 1],
+            'max': data[:, 2],
+            'sum': data[:, 3],
+            'count': data[:, 4],
+            'last': data[:, 5]
+        }
+
+    def _prune_if_due(self):
+        """Delete readings and rollups past their retention period, at most once an hour."""
+        if time.monotonic() - self._last_prune < 3600:
+            return
+        self._last_prune = time.monotonic()
+        now = time.time()
+        # Both tables are keyed on sensor_id first; a range delete per sensor walks the
+        # primary key instead of scanning the whole table
+        sensor_ids = [row[0] for row in self._conn.execute("SELECT id FROM sensors")]
+        with self._conn:
+            if self.retention_days is not None:
+                cutoff = int((now - self.retention_days * 86400) * 1000)
+                self._conn.executemany("DELETE FROM readings WHERE sensor_id = ? AND ts < ?",
+                                       [(sensor_id, cutoff) for sensor_id in sensor_ids])
+            for resolution, retention_days in self.rollups.tiers:
+                if retention_days is not None:
+                    cutoff = int((now - retention_days * 86400) * 1000)
+                    self._conn.executemany(
+                        "DELETE FROM rollups WHERE sensor_id = ? AND resolution = ? AND ts < ?",
+                        [(sensor_id, resolution, cutoff) for sensor_id in sensor_ids])
+
+    def get_stats(self):
+        """
+        Get writer counters.
+
+        Returns:
+            dict: readings written, queued and dropped, rollup buckets written
+        """
+        return {
+            'written': self.written,
+            'pending': len(self._pending),
+            'dropped': self.dropped,
+            'rollups_written': self.rollups_written
+        }
@@ -1,8 +1,11 @@
+import asyncio
 import serial
 import serial.tools.list_ports
 import time
-import datetime
 from typing import Optional, Callable
+from modules.async_support import invoke_callback
+from modules.ring_buffer import RingBuffer
+from modules.flood_forecast import RateOfRiseForecaster
 
 class WaterLevelSensor:
     """
@@ -11,14 +14,49 @@ class WaterLevelSensor:
     Uses callback for handling readings instead of emitting directly.
     """
     
-    def __init__(self, callback: Callable, port: Optional[str] = None, baudrate: int = 9600, timeout: int = 1, threshold: int = 500):
+    # Drop partial data if no newline shows up within this many bytes
+    MAX_LINE_BUFFER = 4096
+    
+    def __init__(self, callback: Callable, port: Optional[str] = None, baudrate: int = 9600, timeout: int = 1, threshold: int = 500,
+                 history: bool = False, history_size: int = 3600, forecast_window: float = 600.0):
+        """
+        Initialize the water level sensor.
+        
+        Args:
+            callback: Function to call with sensor data
+            port: Serial port of the Arduino (default: auto-detect)
+            baudrate: Serial baud rate (default: 9600)
+            timeout: Serial read timeout in seconds (default: 1)
+            threshold: Value above which the water level is high (default: 500)
+            history: Include every sample received since the last callback in the
+                     data as 'samples' (default: False)
+            history_size: Number of recent samples kept in memory in self.recent
+                          (default: 3600)
+            forecast_window: Seconds of samples the rate of rise in self.forecast is
+                             fitted over (default: 600); history_size should cover it
+        """
         self.callback = callback
         self.port = port
         self.baudrate = baudrate
         self.timeout = timeout
         self.threshold = threshold
+        self.history = history
         self.ser = None
         self.is_running = False
+        self._line_buffer = bytearray()
+        self._scheduler = None
+        
+        # Samples received since the last callback
+        self._pending = []
+        self._last_callback = 0.0
+        self._interval = 0.0
+        self._last_drain = None
+        
+        # Every sample received, for windowed stats without touching the database
+        self.recent = RingBuffer(history_size)
+        # Rate-of-rise projection of when the water reaches the threshold; it records
+        # every sample in self.recent and reads expired ones back from there
+        self.forecast = RateOfRiseForecaster(threshold, self.recent, window=forecast_window)
     
     def find_arduino(self):
         """Find Arduino port automatically"""
@@ -49,18 +87,43 @@ class WaterLevelSensor:
                 return False
         return False
     
-    def read_sensor(self):
-        """Read the current value from the water level sensor."""
+    def read_lines(self, block=True):
+        """
+        Return every complete line received from the serial port so far.
+        
+        Args:
+            block: Wait for data (up to the port timeout) if none is buffered yet;
+                   False returns immediately
+        
+        Returns:
+            list: Raw lines (bytes, without the newline); empty on timeout
+        """
         if not self.ser:
-            return None
-        if self.ser.in_waiting > 0:
-            line = self.ser.readline().decode('utf-8').strip()
+            return []
+        if not block and not self.ser.in_waiting:
+            return []
+        # Blocks for the first byte, then takes whatever else is already buffered
+        chunk = self.ser.read(self.ser.in_waiting or 1)
+        if not chunk:
+            return []
+        if self.ser.in_waiting:
+            chunk += self.ser.read(self.ser.in_waiting)
+        
+        self._line_buffer.extend(chunk)
+        *lines, rest = self._line_buffer.split(b'\n')
+        self._line_buffer = bytearray(rest[-self.MAX_LINE_BUFFER:])
+        return lines
+    
+    @staticmethod
+    def parse_lines(lines):
+        """Parse raw serial lines into integer readings, skipping garbled ones."""
+        values = []
+        for line in lines:
             try:
-                value = int(line)
-                return value
+                values.append(int(line.strip()))
             except ValueError:
-                return None
-        return None
+                continue
+        return values
     
     def is_high_water_level(self, value):
         """Check if water level is high based on the threshold."""
@@ -68,42 +131,151 @@ class WaterLevelSensor:
             return False
         return value > self.threshold
 
-    def start_monitoring(self, interval=1.0):
+    def start_monitoring(self, interval=0.0, scheduler=None, poll_interval=0.1):
         """
         Start monitoring the water level sensor and call the callback with readings.
+        
+        The serial port is read as data arrives and every complete line is parsed,
+        so the reported value is always the newest sample instead of an old line
+        left in the buffer. Samples that arrive between callbacks are counted in
+        'sample_count' (and listed in 'samples' when history is enabled).
 
         Args:
-            interval: Time between readings in seconds (default: 1.0)
+            interval: Minimum time between callbacks in seconds; 0 calls back as
+                      soon as new samples arrive (default: 0.0)
+            scheduler: Optional SensorScheduler; when given, the port is drained
+                       without blocking by a 'water_level' task on it and this
+                       call returns once connected (connecting takes about 2s)
+            poll_interval: Seconds between scheduler polls (default: 0.1)
         """
         if not self.connect():
             return
         
         self.is_running = True
+        self._line_buffer = bytearray()
+        self._pending = []
+        self._last_callback = 0.0
+        self._interval = interval
+        self._last_drain = None
+        
+        if scheduler is not None:
+            self._scheduler = scheduler
+            scheduler.add('water_level', self.poll, poll_interval)
+            return
     
         while self.is_running:
-            reading = self.read_sensor()
+            try:
+                self._handle_samples(self.parse_lines(self.read_lines()))
+            except serial.SerialException as e:
+                print(f"Water level sensor serial error: {e}")
+                break
         
-            if reading is not None:
-                high_water = self.is_high_water_level(reading)
+        self.is_running = False
 
-                # Debug prints
-                print(f"Water level sensor reading: {reading}")
-            
-                # Prepare data to send via callback
-                data = {
-                    'timestamp': time.time(),
-                    'value': reading,
-                    'high_water_level': high_water
-                }
-            
-                # Call the callback with the reading data
-                self.callback(data)
+    async def start_monitoring_async(self, interval=0.0):
+        """
+        Asyncio variant of start_monitoring; runs until stop_monitoring is called.
+        
+        Connecting and the blocking serial reads run in the default executor, so
+        the event loop is only busy while parsing lines. The callback may be a
+        coroutine function.
 
-            time.sleep(interval)
+        Args:
+            interval: Minimum time between callbacks in seconds (default: 0.0)
+        """
+        loop = asyncio.get_running_loop()
+        if not await loop.run_in_executor(None, self.connect):
+            return
+        
+        self.is_running = True
+        self._line_buffer = bytearray()
+        self._pending = []
+        self._last_callback = 0.0
+        self._interval = interval
+        self._last_drain = None
+        
+        while self.is_running:
+            try:
+                lines = await loop.run_in_executor(None, self.read_lines)
+            except serial.SerialException as e:
+                print(f"Water level sensor serial error: {e}")
+                break
+            data = self._collect_samples(self.parse_lines(lines))
+            if data is not None:
+                await invoke_callback(self.callback, data)
+        
+        self.is_running = False
+
+    def poll(self):
+        """
+        Drain whatever the port has buffered without blocking and call back if due.
+        
+        A serial error (e.g. the Arduino was unplugged) stops monitoring, like it
+        ends the loop in start_monitoring.
+        """
+        if not self.is_running:
+            return
+        try:
+            lines = self.read_lines(block=False)
+        except serial.SerialException as e:
+            print(f"Water level sensor serial error: {e}")
+            self.stop_monitoring()
+            return
+        self._handle_samples(self.parse_lines(lines))
+
+    def _handle_samples(self, values):
+        """Queue new samples and call the callback with the newest one once the interval allows."""
+        data = self._collect_samples(values)
+        if data is not None:
+            self.callback(data)
+
+    def _collect_samples(self, values):
+        """
+        Queue new samples and, once the interval allows, build the reading for the newest one.
+        
+        Returns:
+            dict: Data for the callback, or None if there is nothing to report yet
+        """
+        if values:
+            # The samples arrived one by one since the previous drain; spread them over
+            # that interval (the newest at now) so the rate of rise sees their real spacing
+            now = time.time()
+            step = (now - self._last_drain) / len(values) if self._last_drain is not None else 0.0
+            for i, value in enumerate(values):
+                # Also records the sample in self.recent
+                self.forecast.update(now - step * (len(values) - 1 - i), value)
+            self._last_drain = now
+        self._pending.extend(values)
+        if not self._pending or time.monotonic() - self._last_callback < self._interval:
+            return None
+        
+        pending = self._pending
+        reading = pending[-1]
+        high_water = self.is_high_water_level(reading)
+
+        # Debug prints
+        print(f"Water level sensor reading: {reading} ({len(pending)} samples)")
+    
+        # Prepare data to send via callback
+        data = {
+            'timestamp': time.time(),
+            'value': reading,
+            'high_water_level': high_water,
+            'sample_count': len(pending)
+        }
+        if self.history:
+            data['samples'] = pending
+    
+        self._pending = []
+        self._last_callback = time.monotonic()
+        return data
 
     def stop_monitoring(self):
         """Stop the monitoring loop."""
         self.is_running = False
+        if self._scheduler is not None:
+            self._scheduler.remove('water_level')
+            self._scheduler = None
     
     def cleanup(self):
         """Clean up resources."""
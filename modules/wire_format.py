@@ -0,0 +1,115 @@
+"""
+Per-client wire formats for Socket.IO payloads.
+
+JSON is the default. Clients can ask for MessagePack at connect time
+(format=msgpack); their events carry a single binary attachment holding the
+MessagePack-encoded payload, which is smaller and cheaper to produce than JSON
+with its repeated string keys. Clients of each format are kept in their own rooms
+('<room>' for JSON, '<room>:msgpack' otherwise), so a payload is encoded once per
+format, not once per client.
+"""
+import threading
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+DEFAULT_FORMAT = 'json'
+
+
+def available_formats() -> tuple:
+    """Formats this server can send (MessagePack only if the msgpack package is installed)."""
+    return ('json', 'msgpack') if msgpack is not None else ('json',)
+
+
+def parse_format(value) -> str:
+    """
+    Validate a client's requested format.
+
+    Args:
+        value: Requested format name, None for the default
+
+    Returns:
+        str: 'json' or 'msgpack'
+
+    Raises:
+        ValueError: If the format is unknown or not available here
+    """
+    if not value:
+        return DEFAULT_FORMAT
+    fmt = str(value).strip().lower()
+    if fmt not in available_formats():
+        raise ValueError(f"Unsupported format: {value} (available: {', '.join(available_formats())})")
+    return fmt
+
+
+def format_room(room: str, fmt: str) -> str:
+    """Room holding the clients of one format."""
+    return room if fmt == DEFAULT_FORMAT else f'{room}:{fmt}'
+
+
+def base_room(room: str) -> str:
+    """Strip the format suffix from a room name."""
+    return room.split(':msgpack')[0]
+
+
+def encode(data, fmt: str):
+    """
+    Encode a payload for a format.
+
+    Returns:
+        The payload unchanged for JSON (Socket.IO serializes it), bytes for MessagePack
+    """
+    if fmt == 'msgpack':
+        return msgpack.packb(data, use_bin_type=True)
+    return data
+
+
+class ClientFormats:
+    """Thread-safe record of which format every connected client uses."""
+
+    def __init__(self):
+        self._formats = {}
+        self._counts = {}
+        self._lock = threading.Lock()
+
+    def set(self, sid: str, fmt: str):
+        """Record a client's format."""
+        with self._lock:
+            self._release(sid)
+            self._formats[sid] = fmt
+            self._counts[fmt] = self._counts.get(fmt, 0) + 1
+
+    def remove(self, sid: str):
+        """Forget a disconnected client."""
+        with self._lock:
+            self._release(sid)
+            self._formats.pop(sid, None)
+
+    def _release(self, sid: str):
+        fmt = self._formats.get(sid)
+        if fmt is not None:
+            self._counts[fmt] -= 1
+            if not self._counts[fmt]:
+                del self._counts[fmt]
+
+    def get(self, sid: str) -> str:
+        """A client's format (JSON if unknown)."""
+        with self._lock:
+            return self._formats.get(sid, DEFAULT_FORMAT)
+
+    def active(self) -> list:
+        """Formats to encode broadcasts in: JSON always, others while a client uses them."""
+        with self._lock:
+            return [DEFAULT_FORMAT] + [fmt for fmt in self._counts if fmt != DEFAULT_FORMAT]
+
+    def get_stats(self):
+        """
+        Get client counts.
+
+        Returns:
+            dict: {format: connected clients}
+        """
+        with self._lock:
+            return dict(self._counts)
@@ -0,0 +1,99 @@
+"""
+Micro-benchmark for the camera frame encoder backends.
+
+Encodes a recorded frame set (a directory of images, e.g. frames saved from the
+camera) with every available backend and prints per-frame time and payload size.
+
+Usage (from the repository root):
+    python -m tools.benchmark_encoders recordings/frames --quality 80 --repeat 5
+    python -m tools.benchmark_encoders --synthetic 50
+"""
+import argparse
+import os
+import time
+import cv2
+import numpy as np
+from modules.jpeg_encoder import ENCODERS, create_encoder
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp')
+
+
+def load_frames(directory, resolution):
+    """Load every image in a directory as a BGR frame, resized to resolution."""
+    frames = []
+    for name in sorted(os.listdir(directory)):
+        if name.lower().endswith(IMAGE_EXTENSIONS):
+            frame = cv2.imread(os.path.join(directory, name))
+            if frame is not None:
+                frames.append(cv2.resize(frame, resolution, interpolation=cv2.INTER_AREA))
+    return frames
+
+
+def synthetic_frames(count, resolution):
+    """Generate smooth gradient frames with some noise, which compress like real scenes."""
+    width, height = resolution
+    rng = np.random.default_rng(0)
+    base = np.linspace(0, 255, width, dtype=np.float32)[np.newaxis, :, np.newaxis]
+    frames = []
+    for i in range(count):
+        frame = np.broadcast_to(base, (height, width, 3)) + rng.normal(0, 12, (height, width, 3))
+        frame = np.roll(frame, i * 4, axis=1)
+        frames.append(np.clip(frame, 0, 255).astype(np.uint8))
+    return frames
+
+
+def benchmark(encoder, frames, quality, scale, repeat):
+    """Encode every frame repeat times and return (per-frame seconds list, mean payload bytes)."""
+    # Warm up so one-time allocations don't skew the first samples
+    encoder.encode(encoder.resize(frames[0], scale), quality)
+
+    timings = []
+    sizes = []
+    for _ in range(repeat):
+        for frame in frames:
+            started = time.perf_counter()
+            # bytes() as in CameraModule's binary transport
+            payload = bytes(encoder.encode(encoder.resize(frame, scale), quality))
+            timings.append(time.perf_counter() - started)
+            sizes.append(len(payload))
+    return timings, sum(sizes) / len(sizes)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark camera frame encoders")
+    parser.add_argument('frames_dir', nargs='?', help="Directory of recorded frames")
+    parser.add_argument('--synthetic', type=int, default=0, help="Use N synthetic frames instead")
+    parser.add_argument('--resolution', default='640x480', help="Frame size WxH (default: 640x480)")
+    parser.add_argument('--quality', type=int, default=80, help="JPEG quality (default: 80)")
+    parser.add_argument('--scale', type=float, default=1.0, help="Downscale factor (default: 1.0)")
+    parser.add_argument('--repeat', type=int, default=3, help="Passes over the frame set (default: 3)")
+    args = parser.parse_args()
+
+    resolution = tuple(int(v) for v in args.resolution.lower().split('x'))
+    if args.frames_dir:
+        frames = load_frames(args.frames_dir, resolution)
+    else:
+        frames = synthetic_frames(args.synthetic or 30, resolution)
+    if not frames:
+        parser.error("No frames to benchmark")
+
+    print(f"{len(frames)} frames at {resolution[0]}x{resolution[1]}, quality {args.quality}, "
+          f"scale {args.scale}, {args.repeat} passes")
+    print(f"{'encoder':<12} {'mean ms':>9} {'p95 ms':>9} {'fps':>8} {'mean KB':>9}")
+
+    for name in ENCODERS:
+        try:
+            encoder = create_encoder(name)
+        except Exception as e:
+            print(f"{name:<12} unavailable: {e}")
+            continue
+
+        timings, mean_size = benchmark(encoder, frames, args.quality, args.scale, args.repeat)
+        timings.sort()
+        mean = sum(timings) / len(timings)
+        p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+        print(f"{name:<12} {mean * 1000:>9.2f} {p95 * 1000:>9.2f} {1 / mean:>8.1f} {mean_size / 1024:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,186 @@
+"""
+Local stand-in for the ML inference server.
+
+Speaks the same Socket.IO protocol as the real server: accepts 'frame' events (binary
+metadata + image, or a legacy data URI string) and answers each one with a
+'processed_frame' event, after a configurable simulated inference delay. Use it to
+benchmark the CameraModule -> camera_callback -> socketio.emit('camera_data') chain
+end-to-end without the real model:
+
+    python -m tools.mock_ml_server --delay 0.15 --jitter 0.05 --record frames.csv
+    ML_SERVER_URL=http://localhost:5001 CAMERA_SOURCE=noise python main.py
+
+Per-frame receive and reply timestamps are kept in memory, summarized (p50/p99) on
+GET /stats and on shutdown, and optionally written to a CSV file.
+"""
+import argparse
+import base64
+import csv
+import os
+import random
+import threading
+import time
+from flask import Flask, jsonify, request
+from flask_socketio import SocketIO
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a list of numbers (None if empty)."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100.0 * len(ordered))) - 1))
+    return ordered[index]
+
+
+class MockInferenceServer:
+    """
+    Simulated inference backend with configurable delay, jitter, failures and reply size.
+
+    Frames are processed by a fixed number of workers (1 by default, like a single
+    model instance), so queueing delay shows up the same way it does on the real server.
+    """
+
+    def __init__(self, delay=0.1, jitter=0.0, failure_rate=0.0, response_bytes=20000,
+                 detection_rate=0.0, workers=1):
+        self.delay = delay
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self.detection_rate = detection_rate
+        self.records = []
+        self._records_lock = threading.Lock()
+        self._workers = threading.Semaphore(workers)
+
+        # Reply image is random bytes of the requested size, generated once
+        filler = base64.b64encode(os.urandom(response_bytes)).decode('utf-8')
+        self.response_image = f'data:image/jpeg;base64,{filler}'
+
+        self.app = Flask(__name__)
+        self.socketio = SocketIO(self.app, cors_allowed_origins="*", async_mode='threading')
+        self._setup_routes()
+
+    def _setup_routes(self):
+        @self.app.route('/stats')
+        def stats():
+            return jsonify(self.summary())
+
+        @self.socketio.on('connect')
+        def handle_connect():
+            print(f"Camera client connected: {request.sid}")
+
+        @self.socketio.on('frame')
+        def handle_frame(*args):
+            received = time.time()
+            if len(args) >= 2:
+                metadata, image = args[0] or {}, args[1]
+            else:
+                metadata, image = {}, args[0] if args else b''
+            self.socketio.start_background_task(self._process, request.sid, metadata, len(image), received)
+
+    def _process(self, sid, metadata, size, received):
+        """Simulate inference for one frame and send the reply."""
+        with self._workers:
+            started = time.time()
+            inference_time = max(0.0, random.gauss(self.delay, self.jitter))
+            time.sleep(inference_time)
+
+            record = {
+                'frame_id': metadata.get('frame_id'),
+                'client_timestamp': metadata.get('timestamp'),
+                'received': received,
+                'started': started,
+                'replied': None,
+                'bytes_in': size,
+                'status': 'failed'
+            }
+
+            if random.random() >= self.failure_rate:
+                reply = {
+                    'frame_id': metadata.get('frame_id'),
+                    'image': self.response_image,
+                    'frame': {},
+                    'inference_time': inference_time
+                }
+                if 'trace' in metadata:
+                    reply['trace'] = metadata['trace']
+                if random.random() < self.detection_rate:
+                    reply['frame']['detections'] = [{'label': 'fire', 'confidence': 0.9, 'box': [10, 10, 120, 120]}]
+                self.socketio.emit('processed_frame', reply, to=sid)
+                record['replied'] = time.time()
+                record['status'] = 'ok'
+
+        with self._records_lock:
+            self.records.append(record)
+
+    def summary(self):
+        """
+        Summarize the recorded frames.
+
+        Returns:
+            dict: frame counts plus p50/p99 of queue wait, service time (receive to
+                  reply) and, when the client sent wall-clock timestamps, client-to-reply
+                  latency, all in milliseconds
+        """
+        with self._records_lock:
+            records = list(self.records)
+        replied = [r for r in records if r['replied'] is not None]
+
+        def stats(values):
+            return {
+                'p50_ms': round(percentile(values, 50) * 1000, 2) if values else None,
+                'p99_ms': round(percentile(values, 99) * 1000, 2) if values else None
+            }
+
+        received = [r['received'] for r in records]
+        span = max(received) - min(received) if received else 0
+        return {
+            'frames': len(records),
+            'replied': len(replied),
+            'failed': len(records) - len(replied),
+            'throughput_fps': round((len(records) - 1) / span, 2) if span > 0 else None,
+            'queue_wait': stats([r['started'] - r['received'] for r in records]),
+            'service_time': stats([r['replied'] - r['received'] for r in replied]),
+            'client_to_reply': stats([r['replied'] - r['client_timestamp'] for r in replied
+                                      if r['client_timestamp'] is not None])
+        }
+
+    def write_records(self, path):
+        """Write every per-frame record to a CSV file."""
+        fields = ['frame_id', 'client_timestamp', 'received', 'started', 'replied', 'bytes_in', 'status']
+        with self._records_lock:
+            records = list(self.records)
+        with open(path, 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=fields)
+            writer.writeheader()
+            writer.writerows(records)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stand-in ML inference server for camera benchmarks")
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=5001)
+    parser.add_argument('--delay', type=float, default=0.1, help="Mean inference delay in seconds (default: 0.1)")
+    parser.add_argument('--jitter', type=float, default=0.0, help="Std deviation of the delay in seconds (default: 0)")
+    parser.add_argument('--failure-rate', type=float, default=0.0, help="Fraction of frames never answered (default: 0)")
+    parser.add_argument('--response-bytes', type=int, default=20000, help="Size of the reply image (default: 20000)")
+    parser.add_argument('--detection-rate', type=float, default=0.0, help="Fraction of replies with a detection")
+    parser.add_argument('--workers', type=int, default=1, help="Frames processed concurrently (default: 1)")
+    parser.add_argument('--record', help="Write per-frame timestamps to this CSV file on shutdown")
+    args = parser.parse_args()
+
+    server = MockInferenceServer(delay=args.delay, jitter=args.jitter, failure_rate=args.failure_rate,
+                                 response_bytes=args.response_bytes, detection_rate=args.detection_rate,
+                                 workers=args.workers)
+    try:
+        server.socketio.run(server.app, host=args.host, port=args.port, allow_unsafe_werkzeug=True)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        print(server.summary())
+        if args.record:
+            server.write_records(args.record)
+            print(f"Per-frame records written to {args.record}")
+
+
+if __name__ == "__main__":
+    main()